@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright © Zdenko Podobný 2014-2017
+# Licensed under the terms of the Apache License Version 2.0
+
+""" LRU cache of initialized tesseract apis
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+from libs import tesstool as tess
+
+
+def estimate_api_memory(lang, tessdata_prefix=None):
+    """ Estimate memory used by api initialized with lang (e.g. 'eng+deu')
+        as size of its traineddata files
+    """
+    size = 0
+    for name in lang.split('+'):
+        path = tess.find_traineddata(name, tessdata_prefix)
+        if path:
+            size += os.path.getsize(path)
+    return size
+
+
+class APICache(object):
+    """ Initialized tesseract apis keyed by (lang, tessdata_prefix, oem)
+        Least recently used apis are ended when there is more than capacity
+        apis or their estimated memory exceeds max_memory (in bytes). Apis
+        leased with pin() are not ended until they are released.
+    """
+
+    def __init__(self, tesseract, capacity=4, max_memory=None):
+        self.tesseract = tesseract
+        self.capacity = max(1, capacity)
+        self.max_memory = max_memory
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._apis = OrderedDict()  # key -> (api, memory)
+        self._pins = {}  # api address -> number of leases
+        self._lock = threading.Lock()
+
+    def get(self, lang, tessdata_prefix=None, oem=None):
+        """ Return api initialized for lang, None if initialization failed
+        """
+        if tessdata_prefix is None:
+            tessdata_prefix = tess.get_tessdata_prefix()
+        key = (lang, tessdata_prefix, oem)
+        with self._lock:
+            if key in self._apis:
+                self._apis.move_to_end(key)
+                self.hits += 1
+                return self._apis[key][0]
+            self.misses += 1
+            api = tess.create_api(self.tesseract, lang, tessdata_prefix, oem)
+            if not api:
+                return None
+            self._apis[key] = (api,
+                               estimate_api_memory(lang, tessdata_prefix))
+            self._evict()
+            return api
+
+    def pin(self, api):
+        """ Lease api, it is not ended by eviction until it is released
+        """
+        with self._lock:
+            self._pins[api.value] = self._pins.get(api.value, 0) + 1
+
+    def release(self, api):
+        """ Return api leased by pin(), it can be evicted again
+        """
+        with self._lock:
+            leases = self._pins.pop(api.value, 0) - 1
+            if leases > 0:
+                self._pins[api.value] = leases
+            self._evict()
+
+    def memory(self):
+        """ Return estimated memory of all cached apis
+        """
+        return sum(memory for _, memory in self._apis.values())
+
+    def _over_limit(self):
+        return (len(self._apis) > self.capacity or
+                (self.max_memory and self.memory() > self.max_memory))
+
+    def _evict(self):
+        """ End least recently used apis which are not pinned, the newest
+            one is always kept
+        """
+        for key in list(self._apis)[:-1]:
+            if not self._over_limit():
+                break
+            api = self._apis[key][0]
+            if api.value in self._pins:
+                continue
+            del self._apis[key]
+            self._end(api)
+            self.evictions += 1
+
+    def _end(self, api):
+        self.tesseract.TessBaseAPIEnd(api)
+        self.tesseract.TessBaseAPIDelete(api)
+
+    def stats(self):
+        """ Return dictionary with cache statistics
+        """
+        return {'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'size': len(self._apis),
+                'memory': self.memory()}
+
+    def clear(self):
+        """ End all cached apis (leased ones too)
+        """
+        with self._lock:
+            self._pins.clear()
+            while self._apis:
+                _, (api, _) = self._apis.popitem()
+                self._end(api)
@@ -52,6 +52,7 @@ class AreaItem(QGraphicsRectItem):
         self.handleSelected = None
         self.mousePressPos = None
         self.mousePressRect = None
+        self.pressGeometry = None
         self.setAcceptHoverEvents(True)
         self.setFlag(QGraphicsItem.ItemIsMovable, True)
         self.setFlag(QGraphicsItem.ItemIsSelectable, True)
@@ -59,7 +60,7 @@ class AreaItem(QGraphicsRectItem):
         self.setFlag(QGraphicsItem.ItemIsFocusable, True)
         self.updateHandlesPos()
 
-        self._selectedChange = SelectedChange()
+        self._selectedChange = SelectedChange(self)
 
     def selectedChange():
         def fget(self):
@@ -98,6 +99,7 @@ class AreaItem(QGraphicsRectItem):
         Executed when the mouse is pressed on the item.
         """
         self.handleSelected = self.handleAt(mouseEvent.pos())
+        self.pressGeometry = self.sceneRect()
         if self.handleSelected:
             self.mousePressPos = mouseEvent.pos()
             self.mousePressRect = self.boundingRect()
@@ -122,6 +124,16 @@ class AreaItem(QGraphicsRectItem):
         self.mousePressPos = None
         self.mousePressRect = None
         self.update()
+        if (self.pressGeometry is not None and
+                self.pressGeometry != self.sceneRect()):
+            self.selectedChange.emit('areaChanged')
+        self.pressGeometry = None
+
+    def sceneRect(self):
+        """
+        Returns area rectangle in scene coordinates.
+        """
+        return self.mapRectToScene(self.rect())
 
     def boundingRect(self):
         """
@@ -294,12 +306,26 @@ class AreaItem(QGraphicsRectItem):
         """
         self.selectedChange.emit('crop2Area')
 
+    def recognizeArea(self):
+        """
+        Recognize OCR boxes inside of area
+        """
+        self.selectedChange.emit('recognizeArea')
+
+    def recognizeAreas(self):
+        """
+        Recognize text of all areas (without cropping of image)
+        """
+        self.selectedChange.emit('recognizeAreas')
+
     def contextMenuEvent(self, event):
         """
         Context menu
         """
         menu = QMenu()
         menu.addAction('Crop image to area', self.crop2Area)
+        menu.addAction('Recognize boxes in area', self.recognizeArea)
+        menu.addAction('Recognize text of all areas', self.recognizeAreas)
         menu.addSeparator()
         menu.addAction('Remove area', self.removeArea)
         menu.exec_(event.screenPos())
@@ -309,8 +335,10 @@ class AreaItem(QGraphicsRectItem):
 class SelectedChange(QObject):
     selectedChange = pyqtSignal(str)
 
-    def __init__(self):
+    def __init__(self, area=None):
         super(SelectedChange, self).__init__()
+        # area item emitting signal, receiver finds it with sender()
+        self.area = area
 
 
 def main():
@@ -0,0 +1,471 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright © Zdenko Podobný 2014-2017
+# Licensed under the terms of the Apache License Version 2.0
+
+""" Headless batch OCR of images without Qt
+
+    Usage: python -m libs.batch [options] (directory|file|glob)...
+"""
+
+import os
+import sys
+import glob
+import argparse
+
+from libs import tesstool as tess
+from libs import lepttool as lept
+from libs import stats
+from libs import writers
+from libs import langindex
+from libs import osdrouter
+from libs.apicache import APICache
+from libs.pagesource import PageSource
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.bmp', '.png', '.tiff', '.tif', '.gif',
+                    '.pnm', '.webp')
+
+# Output formats and file extensions of their results
+FORMATS = {'txt': '.txt', 'tsv': '.tsv', 'hocr': '.hocr', 'jsonl': '.jsonl',
+           'tesstsv': '.tsv', 'alto': '.xml', 'pdf': '.pdf'}
+
+# Formats written only by tesseract renderers
+NATIVE_FORMATS = ('tesstsv', 'alto', 'pdf')
+
+TSV_HEADER = 'page\tindex\tx\ty\tw\th\tconf\ttext\n'
+
+
+def iter_input_files(inputs):
+    """ Yield image files from list of directories, files or glob patterns
+    """
+    for item in inputs:
+        if os.path.isdir(item):
+            names = sorted(os.path.join(item, name)
+                           for name in os.listdir(item))
+            names = [name for name in names
+                     if name.lower().endswith(IMAGE_EXTENSIONS)]
+        elif os.path.isfile(item):
+            names = [item]
+        else:
+            names = sorted(glob.glob(item))
+        for name in names:
+            if os.path.isfile(name):
+                yield name
+
+
+def iter_tsv_lines(results, page_no=0, header=True):
+    """ Yield lines of TSV for results (iterable of tesstool.BoxResult)
+    """
+    if header:
+        yield TSV_HEADER
+    for idx, result in enumerate(results):
+        yield ('%d\t%d\t%d\t%d\t%d\t%d\t%d\t%s\n' %
+               (page_no + 1, idx, result.x, result.y, result.w, result.h,
+                result.conf, result.text.replace('\t', ' ')
+                .replace('\n', ' ')))
+
+
+def format_tsv(results, page_no=0, header=True):
+    """ Return results (iterable of tesstool.BoxResult) as TSV
+    """
+    return ''.join(iter_tsv_lines(results, page_no, header))
+
+
+def set_page(tesseract, api, pix_image, psm):
+    """ Set page image and segmentation mode to api
+    """
+    stats.count('pages')
+    with stats.timed('page/set_image'):
+        tesseract.TessBaseAPIClear(api)
+        tesseract.TessBaseAPISetImage2(api, pix_image)
+        tesseract.TessBaseAPISetPageSegMode(api, psm)
+
+
+def ocr_page(tesseract, api, pix_image, page_no, psm, ril, output_format,
+             filename=''):
+    """ OCR one page and return result in output_format
+    """
+    set_page(tesseract, api, pix_image, psm)
+    with stats.timed('page/recognition'):
+        if output_format == 'tsv':
+            return format_tsv(tess.iter_page_results(tesseract, api, ril),
+                              page_no, header=not page_no)
+        if output_format == 'jsonl':
+            return writers.format_jsonl(
+                tess.iter_page_results(tesseract, api, ril), filename,
+                page_no)
+        if output_format == 'hocr':
+            text_p = tesseract.TessBaseAPIGetHOCRText(api, page_no)
+        else:
+            text_p = tesseract.TessBaseAPIGetUTF8Text(api)
+        return tess.get_text(tesseract, text_p) + '\n'
+
+
+def ocr_file(tesseract, leptonica, api, filename, psm, ril, output_format):
+    """ OCR all pages of image file and return result in output_format
+        Pages are decoded one by one. Return None if image could not be
+        read.
+    """
+    results = []
+    with PageSource(leptonica, filename) as source:
+        if not len(source):
+            print('Image %s can not be opened' % filename, file=sys.stderr)
+            return None
+        for page_no, pix_image in enumerate(source):
+            with pix_image:
+                if not pix_image:
+                    print('Page %d of %s can not be read' %
+                          (page_no + 1, filename), file=sys.stderr)
+                    return None
+                results.append(ocr_page(tesseract, api, pix_image, page_no,
+                                        psm, ril, output_format, filename))
+    # pages of plain text are separated by form feed as tesseract does
+    return ('\f' if output_format == 'txt' else '').join(results)
+
+
+def set_input_image(tesseract, api, pix_image):
+    """ Set original image embedded by PDF renderer
+        Tesseract 3.x has no TessBaseAPISetInputImage, its renderer reads
+        image from input file. Tesseract 4.x takes ownership of passed PIX,
+        so it gets a clone; 5.x clones the PIX itself.
+    """
+    if not hasattr(tesseract, 'TessBaseAPISetInputImage'):
+        return
+    if tess.version_info()[0] == 4:
+        tesseract.TessBaseAPISetInputImage(
+            api, pix_image.leptonica.pixClone(pix_image))
+    else:
+        tesseract.TessBaseAPISetInputImage(api, pix_image)
+
+
+def render_pages(tesseract, api, source, filename, output_name, psm,
+                 output_format):
+    """ Write pages of source with tesseract renderer, every page is
+        written as soon as it is recognized. Return False on failure.
+    """
+    if output_name == '-':
+        outputbase = writers.STDOUT
+    else:
+        outputbase = os.path.splitext(output_name)[0]
+    datapath = tesseract.TessBaseAPIGetDatapath(api)
+    tesseract.TessBaseAPISetInputName(api, filename.encode())
+    with writers.NativeRenderer(tesseract, output_format, outputbase,
+                                datapath and datapath.decode()) as renderer:
+        if not renderer or not renderer.begin(os.path.basename(filename)):
+            print('Could not create %s renderer for %s' %
+                  (output_format, filename), file=sys.stderr)
+            return False
+        for page_no, pix_image in enumerate(source):
+            with pix_image:
+                if not pix_image:
+                    print('Page %d of %s can not be read' %
+                          (page_no + 1, filename), file=sys.stderr)
+                    return False
+                set_page(tesseract, api, pix_image, psm)
+                if output_format == 'pdf':
+                    set_input_image(tesseract, api, pix_image)
+                with stats.timed('page/recognition'):
+                    if not renderer.add_page(api):
+                        print('Rendering of page %d of %s failed' %
+                              (page_no + 1, filename), file=sys.stderr)
+                        return False
+        return renderer.end()
+
+
+def route_page(router, pix_image, filename, page_no):
+    """ Return (api, rotated Pix or None) for page selected by
+        osdrouter.OsdRouter, Pix is returned only if page was not upright
+    """
+    lang, api, osd = router.route(pix_image)
+    if osd is not None:
+        print('%s [%d]: script %s, orientation %d -> %s' %
+              (filename, page_no + 1, osd.script, osd.orientation, lang),
+              file=sys.stderr)
+    return api, osdrouter.upright(pix_image, osd)
+
+
+def write_page(tesseract, api, pix_image, filename, page_no, psm, ril,
+               output_format, stream, jsonl_writer):
+    """ Write one page to stream
+    """
+    if output_format not in ('tsv', 'jsonl'):
+        if page_no and output_format == 'txt':
+            stream.write('\f')
+        stream.write(ocr_page(tesseract, api, pix_image, page_no, psm, ril,
+                              output_format, filename))
+        return
+    set_page(tesseract, api, pix_image, psm)
+    with stats.timed('page/recognition'):
+        results = tess.iter_page_results(tesseract, api, ril)
+        if output_format == 'jsonl':
+            jsonl_writer.write_results(results, filename, page_no)
+        else:
+            stream.writelines(iter_tsv_lines(results, page_no,
+                                             header=not page_no))
+
+
+def write_pages(tesseract, api, source, filename, psm, ril, output_format,
+                stream, router=None):
+    """ Write pages of source to stream, TSV and JSON Lines results are
+        written one by one as result iterator produces them. Return False
+        on failure. If router is given, api of every page is selected by
+        detected script.
+    """
+    jsonl_writer = writers.JsonLinesWriter(stream)
+    for page_no, pix_image in enumerate(source):
+        with pix_image:
+            if not pix_image:
+                print('Page %d of %s can not be read' %
+                      (page_no + 1, filename), file=sys.stderr)
+                return False
+            if router is not None:
+                api, rotated = route_page(router, pix_image, filename,
+                                          page_no)
+                if not api:
+                    return False
+                if rotated:
+                    with rotated:
+                        write_page(tesseract, api, rotated, filename,
+                                   page_no, psm, ril, output_format, stream,
+                                   jsonl_writer)
+                    continue
+            write_page(tesseract, api, pix_image, filename, page_no, psm,
+                       ril, output_format, stream, jsonl_writer)
+    stream.flush()
+    return True
+
+
+def stream_file(tesseract, leptonica, api, filename, psm, ril, args,
+                router=None):
+    """ OCR all pages of image file and write them directly to output
+        Tesseract renderers are used for formats they provide. Return False
+        if image could not be read or written.
+    """
+    if args.output_dir == '-':
+        output_name = '-'
+    else:
+        output_name = get_output_name(filename, args.output_dir,
+                                      args.format)
+    with PageSource(leptonica, filename) as source:
+        if not len(source):
+            print('Image %s can not be opened' % filename, file=sys.stderr)
+            return False
+        if router is None and writers.has_renderer(tesseract, args.format):
+            done = render_pages(tesseract, api, source, filename,
+                                output_name, psm, args.format)
+        elif args.format in NATIVE_FORMATS:
+            print('Format %s is not supported by tesseract %s' %
+                  (args.format, tess.VERSION), file=sys.stderr)
+            return False
+        elif output_name == '-':
+            done = write_pages(tesseract, api, source, filename, psm, ril,
+                               args.format, sys.stdout, router)
+        else:
+            with open(output_name, 'w', encoding='utf-8') as output:
+                done = write_pages(tesseract, api, source, filename, psm,
+                                   ril, args.format, output, router)
+    if done and output_name != '-':
+        print('%s -> %s' % (filename, output_name), file=sys.stderr)
+    return done
+
+
+def get_output_name(filename, output_dir, output_format):
+    """ Return name of output file for image filename
+    """
+    base = os.path.splitext(os.path.basename(filename))[0]
+    if output_dir is None:
+        output_dir = os.path.dirname(filename)
+    return os.path.join(output_dir, base + FORMATS[output_format])
+
+
+def parse_args(argv=None):
+    """ Parse command line arguments
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m libs.batch',
+        description='OCR images with tesseract without GUI.')
+    parser.add_argument('inputs', nargs='*',
+                        help='image files, directories or glob patterns')
+    parser.add_argument('-l', '--lang', default='eng',
+                        help='language(s) used for OCR (default: eng)')
+    parser.add_argument('--psm', default='PSM_AUTO', choices=tess.PSM,
+                        help='page segmentation mode (default: PSM_AUTO)')
+    parser.add_argument('--ril', default='RIL_WORD', choices=tess.RIL,
+                        help='iterator level of TSV and JSON Lines output '
+                             '(default: RIL_WORD)')
+    parser.add_argument('-f', '--format', default='txt',
+                        choices=sorted(FORMATS),
+                        help='output format (default: txt); txt, hocr, '
+                             'tesstsv, alto and pdf are written by '
+                             'tesseract renderers if available')
+    parser.add_argument('-o', '--output-dir', default=None,
+                        help="output directory, '-' for stdout "
+                             "(default: directory of input image)")
+    parser.add_argument('--tessdata-prefix', default=None,
+                        help='location of tessdata (default: '
+                             'TESSDATA_PREFIX environment variable)')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='number of workers (default: 1)')
+    parser.add_argument('--threads', action='store_true',
+                        help='run workers as threads sharing loaded '
+                             'libraries instead of processes')
+    parser.add_argument('--stats', default=None, metavar='FILE',
+                        help="write timing and counters to FILE, '-' for "
+                             "stderr (native calls are timed only in this "
+                             "process, i.e. with -j 1 or --threads)")
+    parser.add_argument('--stats-format', default='json',
+                        choices=['json', 'prometheus'],
+                        help='format of statistics (default: json)')
+    parser.add_argument('--route', action='store_true',
+                        help='detect script and orientation of every page '
+                             'and recognize it with language mapped to '
+                             'script, --lang is used as fallback')
+    parser.add_argument('--script-langs', default='',
+                        help="script mapping used by --route, e.g. "
+                             "'Latin=eng+deu,Cyrillic=rus'")
+    parser.add_argument('--list-langs', action='store_true',
+                        help='print available languages and exit')
+    args = parser.parse_args(argv)
+    if not args.inputs and not args.list_langs:
+        parser.error('the following arguments are required: inputs')
+    return args
+
+
+def main(argv=None):
+    """ Run batch OCR
+    """
+    args = parse_args(argv)
+    if args.stats:
+        stats.enable()
+    try:
+        return run(args)
+    finally:
+        if args.stats:
+            write_stats(args.stats, args.stats_format)
+
+
+def write_stats(filename, stats_format):
+    """ Write collected statistics to file (or stderr if filename is '-')
+    """
+    if stats_format == 'prometheus':
+        text = stats.to_prometheus()
+    else:
+        text = stats.to_json() + '\n'
+    if filename == '-':
+        sys.stderr.write(text)
+        return
+    with open(filename, 'w') as output:
+        output.write(text)
+
+
+def run(args):
+    """ OCR inputs given by parsed arguments, return exit code
+    """
+    if args.list_langs:
+        print('\n'.join(langindex.get_languages(args.tessdata_prefix)))
+        return 0
+    tesseract = tess.get_tesseract(os.path.dirname(__file__))
+    if not tesseract:
+        print('Tesseract is not available', file=sys.stderr)
+        return 1
+    if args.output_dir not in (None, '-'):
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    psm = tess.PSM.index(args.psm)
+    ril = tess.RIL.index(args.ril)
+    filenames = iter_input_files(args.inputs)
+    if args.route and (args.jobs > 1 or args.format in NATIVE_FORMATS):
+        print('--route can be used only with -j 1 and formats txt, hocr, '
+              'tsv and jsonl', file=sys.stderr)
+        return 1
+    if args.jobs > 1:
+        if args.format in NATIVE_FORMATS:
+            print('Format %s can be written only with -j 1' % args.format,
+                  file=sys.stderr)
+            return 1
+        from libs import engine
+        if args.threads:
+            engine_class = engine.ThreadPoolEngine
+        else:
+            engine_class = engine.ProcessPoolEngine
+        try:
+            with engine_class(args.lang, args.jobs, args.tessdata_prefix,
+                              psm, ril, args.format) as pool:
+                return write_results(pool.map(filenames), args)
+        except RuntimeError as error:
+            print(error, file=sys.stderr)
+            return 1
+
+    leptonica = lept.get_leptonica()
+    if not leptonica:
+        print('Leptonica is not available', file=sys.stderr)
+        return 1
+    if args.route:
+        return route_files(tesseract, leptonica, filenames, psm, ril, args)
+    api = tess.create_api(tesseract, args.lang, args.tessdata_prefix)
+    if not api:
+        return 1
+    failed = 0
+    try:
+        for filename in filenames:
+            if not stream_file(tesseract, leptonica, api, filename, psm, ril,
+                               args):
+                failed += 1
+        return 1 if failed else 0
+    finally:
+        tesseract.TessBaseAPIEnd(api)
+        tesseract.TessBaseAPIDelete(api)
+
+
+def route_files(tesseract, leptonica, filenames, psm, ril, args):
+    """ OCR files with language of every page selected by its script,
+        return exit code
+    """
+    try:
+        script_langs = osdrouter.parse_script_langs(args.script_langs)
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        return 1
+    api_cache = APICache(tesseract)
+    router = osdrouter.OsdRouter(api_cache, args.lang, script_langs,
+                                 args.tessdata_prefix)
+    try:
+        if not router.is_available():
+            print('Script detection is not available (tesseract %s or '
+                  'missing osd.traineddata)' % tess.VERSION,
+                  file=sys.stderr)
+            return 1
+        router.preload()
+        failed = 0
+        for filename in filenames:
+            if not stream_file(tesseract, leptonica, None, filename, psm,
+                               ril, args, router):
+                failed += 1
+        print('Pages per language: %s' % ', '.join(
+            '%s %d' % item for item in sorted(router.routed.items())),
+            file=sys.stderr)
+        return 1 if failed else 0
+    finally:
+        api_cache.clear()
+
+
+def write_results(results, args):
+    """ Write (filename, result) pairs to output, return exit code
+    """
+    failed = 0
+    for filename, result in results:
+        if result is None:
+            failed += 1
+            continue
+        if args.output_dir == '-':
+            sys.stdout.write(result)
+            continue
+        output_name = get_output_name(filename, args.output_dir, args.format)
+        with open(output_name, 'w', encoding='utf-8') as output:
+            output.write(result)
+        print('%s -> %s' % (filename, output_name), file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright © Zdenko Podobný 2014-2017
+# Licensed under the terms of the Apache License Version 2.0
+
+""" Benchmark of OCR path on sample images
+
+    Usage: python -m libs.benchmark [-o result.json] [--compare old.json]
+"""
+
+import os
+import sys
+import importlib.util
+import json
+import time
+import platform
+import subprocess
+import argparse
+import statistics
+
+try:
+    import resource
+except ImportError:  # not available on MS Windows
+    resource = None
+
+from libs import tesstool as tess
+from libs import lepttool as lept
+
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'images')
+SAMPLE_IMAGES = ['phototest.tif', 'eurotext.tif', '8509_001.4B.tif']
+# Modules imported on startup of pyTesseractDemo before window is shown
+STARTUP_MODULES = ['libs.settings', 'libs.tesstool', 'libs.lepttool',
+                   'libs.stats', 'libs.preprocess', 'libs.resultcache',
+                   'libs.langindex', 'libs.ocrworker', 'libs.startup']
+
+
+def measure(func, *args, repeat=1):
+    """ Call func repeat times and return (timing, result of last call)
+        timing is dictionary with min and median seconds.
+    """
+    times = []
+    result = None
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        result = func(*args)
+        times.append(time.perf_counter() - start)
+    return {'min': min(times), 'median': statistics.median(times)}, result
+
+
+def peak_rss_kb():
+    """ Return peak resident set size of process in KiB or None
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':  # bytes on macOS
+        peak //= 1024
+    return peak
+
+
+def import_time(module):
+    """ Return cumulative import time of module in seconds measured in
+        fresh interpreter by -X importtime, None if import failed
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+        cwd=root, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        universal_newlines=True)
+    if process.returncode:
+        return None
+    # lines: 'import time: self [us] | cumulative | imported package'
+    for line in process.stderr.splitlines():
+        fields = line.split('|')
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1e6
+    return None
+
+
+def measure_imports(modules, repeat=1):
+    """ Return {module: {'min':..., 'median':...}} of import times
+    """
+    imports = {}
+    for module in modules:
+        times = [import_time(module) for _ in range(max(repeat, 1))]
+        if None in times:
+            print('Module %s can not be imported' % module, file=sys.stderr)
+            continue
+        imports[module] = {'min': min(times),
+                           'median': statistics.median(times)}
+    return imports
+
+
+def time_to_qimage(leptonica, pix_image, repeat):
+    """ Time conversion of PIX to QImage, None if PyQt5 is not available
+    """
+    if importlib.util.find_spec('PyQt5') is None:
+        return None
+    timing, _ = measure(pix_image.to_qimage, repeat=repeat)
+    return timing
+
+
+def run_combination(tesseract, leptonica, api, pix_image, psm, ril, repeat):
+    """ Time component extraction and recognition of components for psm
+        and ril, and single pass recognition of whole page for comparison
+    """
+    def components():
+        tesseract.TessBaseAPIClear(api)
+        tesseract.TessBaseAPISetImage2(api, pix_image)
+        tesseract.TessBaseAPISetPageSegMode(api, psm)
+        with lept.Boxa(leptonica, tess.get_component_images(
+                tesseract, api, ril)) as boxa:
+            return lept.boxes_to_list(boxa.geometry())
+
+    def recognition(boxes):
+        return list(tess.iter_rectangle_results(tesseract, api, boxes, ril))
+
+    def single_pass():
+        tesseract.TessBaseAPIClear(api)
+        tesseract.TessBaseAPISetImage2(api, pix_image)
+        tesseract.TessBaseAPISetPageSegMode(api, psm)
+        return list(tess.iter_page_results(tesseract, api, ril))
+
+    extraction, boxes = measure(components, repeat=repeat)
+    recognized, results = measure(recognition, boxes, repeat=repeat)
+    page, page_results = measure(single_pass, repeat=repeat)
+    return {'psm': tess.PSM[psm], 'ril': tess.RIL[ril],
+            'components': extraction, 'n_components': len(boxes),
+            'recognition': recognized,
+            'chars': sum(len(result.text) for result in results),
+            'single_pass': page, 'n_results': len(page_results)}
+
+
+def run(args):
+    """ Run benchmark and return results as dictionary
+    """
+    report = {'meta': {'python': platform.python_version(),
+                       'platform': platform.platform(),
+                       'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                       'lang': args.lang, 'repeat': args.repeat}}
+    report['imports'] = measure_imports(STARTUP_MODULES, args.repeat)
+    if args.imports_only:
+        return report
+    load = {}
+    load['get_tesseract'], tesseract = measure(
+        tess.get_tesseract, os.path.dirname(__file__))
+    load['get_leptonica'], leptonica = measure(lept.get_leptonica)
+    if not tesseract or not leptonica:
+        print('Tesseract or leptonica is not available', file=sys.stderr)
+        return None
+    report['meta']['tesseract'] = tess.VERSION
+    report['meta']['leptonica'] = lept.get_version(leptonica)
+    load['init'], api = measure(tess.create_api, tesseract, args.lang,
+                                args.tessdata_prefix)
+    report['load'] = load
+    if not api:
+        return None
+
+    psms = [tess.PSM.index(psm) for psm in args.psm] or range(len(tess.PSM))
+    rils = [tess.RIL.index(ril) for ril in args.ril] or range(len(tess.RIL))
+    report['images'] = {}
+    try:
+        for filename in args.images:
+            name = os.path.basename(filename)
+            timing, pix_image = measure(lept.Pix.read, leptonica, filename,
+                                        repeat=args.repeat)
+            if not pix_image:
+                print('Image %s can not be read' % filename, file=sys.stderr)
+                continue
+            with pix_image:
+                image = {'size': [pix_image.width, pix_image.height,
+                                  pix_image.depth],
+                         'read': timing,
+                         'to_qimage': time_to_qimage(leptonica, pix_image,
+                                                     args.repeat),
+                         'runs': []}
+                for psm in psms:
+                    for ril in rils:
+                        result = run_combination(tesseract, leptonica, api,
+                                                 pix_image, psm, ril,
+                                                 args.repeat)
+                        image['runs'].append(result)
+                        print('%s %s %s: %d components %.3fs, '
+                              'recognition %.3fs, single pass %.3fs' %
+                              (name, result['psm'], result['ril'],
+                               result['n_components'],
+                               result['components']['median'],
+                               result['recognition']['median'],
+                               result['single_pass']['median']),
+                              file=sys.stderr)
+            report['images'][name] = image
+    finally:
+        tesseract.TessBaseAPIEnd(api)
+        tesseract.TessBaseAPIDelete(api)
+    report['peak_rss_kb'] = peak_rss_kb()
+    return report
+
+
+def iter_timings(report):
+    """ Yield (metric name, median seconds) of report
+    """
+    for name, timing in sorted(report.get('imports', {}).items()):
+        yield 'import/' + name, timing['median']
+    for name, timing in sorted(report.get('load', {}).items()):
+        yield 'load/' + name, timing['median']
+    for image_name, image in sorted(report.get('images', {}).items()):
+        for name in ('read', 'to_qimage'):
+            if image.get(name):
+                yield '%s/%s' % (image_name, name), image[name]['median']
+        for result in image['runs']:
+            for name in ('components', 'recognition', 'single_pass'):
+                if name not in result:  # report of older version
+                    continue
+                yield ('%s/%s/%s/%s' % (image_name, result['psm'],
+                                        result['ril'], name),
+                       result[name]['median'])
+
+
+def compare(old, new, threshold=0.1, min_seconds=0.001):
+    """ Print metrics which changed more than threshold, return number of
+        regressions
+    """
+    old_timings = dict(iter_timings(old))
+    regressions = 0
+    for name, seconds in iter_timings(new):
+        previous = old_timings.get(name)
+        if previous is None or max(previous, seconds) < min_seconds:
+            continue
+        change = (seconds - previous) / max(previous, 1e-9)
+        if abs(change) > threshold:
+            if change > 0:
+                regressions += 1
+            print('%-60s %8.4fs -> %8.4fs (%+.0f%%)' %
+                  (name, previous, seconds, change * 100), file=sys.stderr)
+    if old.get('peak_rss_kb') and new.get('peak_rss_kb'):
+        print('peak RSS %d KiB -> %d KiB' % (old['peak_rss_kb'],
+                                             new['peak_rss_kb']),
+              file=sys.stderr)
+    return regressions
+
+
+def main(argv=None):
+    """ Run benchmark, write JSON and optionally compare with previous run
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m libs.benchmark',
+        description='Time library load, image reading and OCR for every '
+                    'PSM x RIL combination.')
+    parser.add_argument('images', nargs='*',
+                        default=[os.path.join(IMAGES_DIR, name)
+                                 for name in SAMPLE_IMAGES],
+                        help='images (default: bundled sample images)')
+    parser.add_argument('-l', '--lang', default='eng')
+    parser.add_argument('--tessdata-prefix', default=None)
+    parser.add_argument('--psm', action='append', default=[],
+                        choices=tess.PSM,
+                        help='benchmark only this PSM (repeatable)')
+    parser.add_argument('--ril', action='append', default=[],
+                        choices=tess.RIL,
+                        help='benchmark only this RIL (repeatable)')
+    parser.add_argument('--imports-only', action='store_true',
+                        help='measure only import time of startup modules')
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help='repetitions of each measurement (default: 3)')
+    parser.add_argument('-o', '--output', default='-',
+                        help="JSON result file, '-' for stdout")
+    parser.add_argument('--compare', default=None,
+                        help='previous JSON result to compare with')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='reported relative change (default: 0.1)')
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    if report is None:
+        return 1
+    if args.output == '-':
+        json.dump(report, sys.stdout, indent=1)
+        print()
+    else:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=1)
+    if args.compare:
+        with open(args.compare) as previous:
+            if compare(json.load(previous), report, args.threshold):
+                return 2
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
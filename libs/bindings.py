@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright © Zdenko Podobný 2014-2017
+# Licensed under the terms of the Apache License Version 2.0
+
+""" ctypes prototypes of tesseract and leptonica C-API functions
+
+    Prototypes are declared once when library is loaded (see
+    tesstool.get_tesseract and lepttool.get_leptonica), so pointers are not
+    truncated to int on 64bit platforms and callers do not need to set
+    restype/argtypes before calls.
+"""
+
+import ctypes
+
+PTR = ctypes.c_void_p
+PTR_PTR = ctypes.POINTER(ctypes.c_void_p)
+INT = ctypes.c_int
+INT_PTR = ctypes.POINTER(ctypes.c_int)
+FLOAT = ctypes.c_float
+FLOAT_PTR = ctypes.POINTER(ctypes.c_float)
+STR = ctypes.c_char_p
+SIZE_T_PTR = ctypes.POINTER(ctypes.c_size_t)
+
+# BOOL (*TessCancelFunc)(void* cancel_this, int words)
+CANCEL_FUNC = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.c_int)
+
+# name: (restype, argtypes)
+TESSERACT_PROTOTYPES = {
+    'TessVersion': (STR, []),
+    'TessDeleteText': (None, [PTR]),
+    'TessDeleteTextArray': (None, [ctypes.POINTER(STR)]),
+    'TessBaseAPICreate': (PTR, []),
+    'TessBaseAPIDelete': (None, [PTR]),
+    'TessBaseAPIInit2': (INT, [PTR, STR, STR, INT]),
+    'TessBaseAPIInit3': (INT, [PTR, STR, STR]),
+    'TessBaseAPIEnd': (None, [PTR]),
+    'TessBaseAPIClear': (None, [PTR]),
+    'TessBaseAPISetVariable': (INT, [PTR, STR, STR]),
+    'TessBaseAPIGetInitLanguagesAsString': (STR, [PTR]),
+    'TessBaseAPIGetAvailableLanguagesAsVector': (ctypes.POINTER(STR), [PTR]),
+    'TessBaseAPISetImage2': (None, [PTR, PTR]),
+    'TessBaseAPISetInputName': (None, [PTR, STR]),
+    'TessBaseAPISetInputImage': (None, [PTR, PTR]),
+    'TessBaseAPIGetDatapath': (STR, [PTR]),
+    'TessBaseAPISetPageSegMode': (None, [PTR, INT]),
+    'TessBaseAPIGetPageSegMode': (INT, [PTR]),
+    'TessBaseAPISetRectangle': (None, [PTR, INT, INT, INT, INT]),
+    'TessBaseAPIGetComponentImages': (PTR, [PTR, INT, INT, PTR, PTR]),
+    'TessBaseAPIAnalyseLayout': (PTR, [PTR]),
+    'TessBaseAPIRecognize': (INT, [PTR, PTR]),
+    'TessBaseAPIGetUTF8Text': (PTR, [PTR]),
+    'TessBaseAPIGetHOCRText': (PTR, [PTR, INT]),
+    'TessBaseAPIMeanTextConf': (INT, [PTR]),
+    'TessBaseAPIGetIterator': (PTR, [PTR]),
+    'TessResultIteratorDelete': (None, [PTR]),
+    'TessResultIteratorNext': (INT, [PTR, INT]),
+    'TessResultIteratorGetPageIterator': (PTR, [PTR]),
+    'TessResultIteratorGetUTF8Text': (PTR, [PTR, INT]),
+    'TessResultIteratorConfidence': (FLOAT, [PTR, INT]),
+    'TessMonitorCreate': (PTR, []),
+    'TessMonitorDelete': (None, [PTR]),
+    'TessMonitorSetCancelFunc': (None, [PTR, CANCEL_FUNC]),
+    'TessTextRendererCreate': (PTR, [STR]),
+    'TessHOcrRendererCreate': (PTR, [STR]),
+    'TessTsvRendererCreate': (PTR, [STR]),
+    'TessPDFRendererCreate': (PTR, [STR, STR, INT]),
+    'TessAltoRendererCreate': (PTR, [STR]),
+    'TessDeleteResultRenderer': (None, [PTR]),
+    'TessResultRendererBeginDocument': (INT, [PTR, STR]),
+    'TessResultRendererAddImage': (INT, [PTR, PTR]),
+    'TessResultRendererEndDocument': (INT, [PTR]),
+    'TessPageIteratorDelete': (None, [PTR]),
+    'TessPageIteratorNext': (INT, [PTR, INT]),
+    'TessPageIteratorBoundingBox': (INT, [PTR, INT, INT_PTR, INT_PTR,
+                                          INT_PTR, INT_PTR]),
+    'TessBaseAPIDetectOrientationScript': (INT, [PTR, INT_PTR, FLOAT_PTR,
+                                                 ctypes.POINTER(STR),
+                                                 FLOAT_PTR]),
+}
+
+LEPTONICA_PROTOTYPES = {
+    'getLeptonicaVersion': (STR, []),
+    'getImagelibVersions': (STR, []),
+    'pixRead': (PTR, [STR]),
+    'pixReadTiff': (PTR, [STR, INT]),
+    'pixReadFromMultipageTiff': (PTR, [STR, SIZE_T_PTR]),
+    'fopenReadStream': (PTR, [STR]),
+    'lept_fclose': (INT, [PTR]),
+    'tiffGetCount': (INT, [PTR, INT_PTR]),
+    'pixDestroy': (None, [PTR_PTR]),
+    'pixGetWidth': (INT, [PTR]),
+    'pixGetHeight': (INT, [PTR]),
+    'pixGetDepth': (INT, [PTR]),
+    'pixGetWpl': (INT, [PTR]),
+    'pixGetXRes': (INT, [PTR]),
+    'pixGetYRes': (INT, [PTR]),
+    'pixGetData': (PTR, [PTR]),
+    'pixGetColormap': (PTR, [PTR]),
+    'pixConvertTo32': (PTR, [PTR]),
+    'pixEndianByteSwapNew': (PTR, [PTR]),
+    'pixClipRectangle': (PTR, [PTR, PTR, PTR]),
+    'pixClone': (PTR, [PTR]),
+    'pixScale': (PTR, [PTR, FLOAT, FLOAT]),
+    'pixScaleToGray': (PTR, [PTR, FLOAT]),
+    'pixRotateOrth': (PTR, [PTR, INT]),
+    'pixWrite': (INT, [STR, PTR, INT]),
+    'pixConvertTo1': (PTR, [PTR, INT]),
+    'pixConvertTo8': (PTR, [PTR, INT]),
+    'pixSauvolaBinarizeTiled': (INT, [PTR, INT, FLOAT, INT, INT, PTR,
+                                      PTR_PTR]),
+    'pixOtsuAdaptiveThreshold': (INT, [PTR, INT, INT, INT, INT, FLOAT, PTR,
+                                       PTR_PTR]),
+    'pixDeskew': (PTR, [PTR, INT]),
+    'pixSelectBySize': (PTR, [PTR, INT, INT, INT, INT, INT, INT_PTR]),
+    'pixRemoveBorderConnComps': (PTR, [PTR, INT]),
+    'boxCreate': (PTR, [INT, INT, INT, INT]),
+    'boxDestroy': (None, [PTR_PTR]),
+    'boxaGetCount': (INT, [PTR]),
+    'boxaGetBox': (PTR, [PTR, INT, INT]),
+    'boxaDestroy': (None, [PTR_PTR]),
+}
+
+
+def declare(library, prototypes):
+    """ Set restype and argtypes of library functions
+        Functions missing in loaded library version are skipped.
+    """
+    for name, (restype, argtypes) in prototypes.items():
+        try:
+            function = getattr(library, name)
+        except AttributeError:
+            continue
+        function.restype = restype
+        function.argtypes = argtypes
+    return library
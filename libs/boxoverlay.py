@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright © Zdenko Podobný 2014-2017
+# Licensed under the terms of the Apache License Version 2.0
+
+""" Graphics item drawing all OCR boxes in one paint pass
+"""
+
+from array import array
+
+from PyQt5.QtCore import Qt, QRectF, pyqtSignal
+from PyQt5.QtGui import QBrush, QColor, QPen
+from PyQt5.QtWidgets import QGraphicsItem, QGraphicsObject
+
+from libs import stats
+
+
+class GridIndex(object):
+    """ Uniform grid spatial index of boxes
+    """
+
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self.cells = {}
+
+    def _cells(self, x, y, w, h):
+        size = self.cell_size
+        for cell_x in range(x // size, (x + max(w, 1) - 1) // size + 1):
+            for cell_y in range(y // size, (y + max(h, 1) - 1) // size + 1):
+                yield cell_x, cell_y
+
+    def insert(self, index, x, y, w, h):
+        """ Add box with index
+        """
+        for cell in self._cells(x, y, w, h):
+            self.cells.setdefault(cell, []).append(index)
+
+    def query(self, x, y, w, h):
+        """ Return set of indexes of boxes which can intersect rectangle
+        """
+        found = set()
+        for cell in self._cells(x, y, w, h):
+            found.update(self.cells.get(cell, ()))
+        return found
+
+    def clear(self):
+        self.cells = {}
+
+
+class BoxOverlay(QGraphicsObject):
+    """ Item holding all boxes in packed array and painting only those in
+        exposed rectangle. Tooltip of box under mouse is found with spatial
+        index instead of hover events of item per box.
+    """
+    # index of box clicked with left mouse button
+    boxClicked = pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        super(BoxOverlay, self).__init__(parent)
+        self.pen = QPen(QColor(255, 0, 0, 255))
+        self.pen.setCosmetic(True)
+        self.brush = QBrush(QColor(255, 0, 0, 100))
+        self.geometry = array('i')  # x, y, w, h of each box
+        self.tooltips = []
+        self.index = GridIndex()
+        self._bounds = QRectF()
+        self.setAcceptHoverEvents(True)
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption, True)
+        self.setZValue(1)
+
+    def __len__(self):
+        return len(self.tooltips)
+
+    def add_results(self, results):
+        """ Add boxes of tesstool.BoxResult items
+        """
+        added = QRectF()
+        for result in results:
+            idx = len(self.tooltips)
+            self.geometry.extend((result.x, result.y, result.w, result.h))
+            self.tooltips.append('Box[%d]: confidence:%s, text:%s' %
+                                 (idx, result.conf, result.text))
+            self.index.insert(idx, result.x, result.y, result.w, result.h)
+            added = added.united(QRectF(result.x, result.y, result.w,
+                                        result.h))
+        if added.isNull():
+            return
+        bounds = self._bounds.united(added)
+        if bounds != self._bounds:
+            self.prepareGeometryChange()
+            self._bounds = bounds
+        self.update(added)
+
+    def replace_results(self, results):
+        """ Replace all boxes with results in place, only boxes whose
+            geometry or text changed are repainted
+        """
+        old_geometry = self.geometry
+        old_tooltips = self.tooltips
+        self.geometry = array('i')
+        self.tooltips = []
+        self.index.clear()
+        bounds = QRectF()
+        changed = QRectF()
+        for idx, result in enumerate(results):
+            box = (result.x, result.y, result.w, result.h)
+            tooltip = ('Box[%d]: confidence:%s, text:%s' %
+                       (idx, result.conf, result.text))
+            self.geometry.extend(box)
+            self.tooltips.append(tooltip)
+            self.index.insert(idx, *box)
+            rect = QRectF(*box)
+            bounds = bounds.united(rect)
+            if (idx >= len(old_tooltips) or old_tooltips[idx] != tooltip or
+                    tuple(old_geometry[idx * 4:idx * 4 + 4]) != box):
+                changed = changed.united(rect)
+                if idx < len(old_tooltips):
+                    changed = changed.united(
+                        QRectF(*old_geometry[idx * 4:idx * 4 + 4]))
+        for idx in range(len(results), len(old_tooltips)):
+            changed = changed.united(
+                QRectF(*old_geometry[idx * 4:idx * 4 + 4]))
+        if bounds != self._bounds:
+            self.prepareGeometryChange()
+            self._bounds = bounds
+        if not changed.isNull():
+            self.update(changed)
+
+    def set_result(self, idx, result):
+        """ Replace tooltip of box idx with recognized result
+        """
+        self.tooltips[idx] = ('Box[%d]: confidence:%s, text:%s' %
+                              (idx, result.conf, result.text))
+        self.update(self.box_rect(idx))
+
+    def clear(self):
+        """ Remove all boxes
+        """
+        self.prepareGeometryChange()
+        self.geometry = array('i')
+        self.tooltips = []
+        self.index.clear()
+        self._bounds = QRectF()
+        self.setToolTip('')
+        self.update()
+
+    def box_rect(self, idx):
+        """ Return QRectF of box idx
+        """
+        x, y, w, h = self.geometry[idx * 4:idx * 4 + 4]
+        return QRectF(x, y, w, h)
+
+    def boxes_in(self, rect):
+        """ Return sorted indexes of boxes intersecting rect
+        """
+        candidates = self.index.query(int(rect.x()), int(rect.y()),
+                                      int(rect.width()) + 1,
+                                      int(rect.height()) + 1)
+        return sorted(idx for idx in candidates
+                      if self.box_rect(idx).intersects(rect))
+
+    def box_at(self, pos):
+        """ Return index of last box containing point pos, None if there is
+            no such box
+        """
+        candidates = self.index.query(int(pos.x()), int(pos.y()), 1, 1)
+        inside = [idx for idx in candidates
+                  if self.box_rect(idx).contains(pos)]
+        return max(inside) if inside else None
+
+    def boundingRect(self):
+        return self._bounds
+
+    def paint(self, painter, option, widget=None):
+        """ Paint boxes in exposed rectangle at once
+        """
+        if not self.tooltips:
+            return
+        with stats.timed('draw/boxes'):
+            rects = [self.box_rect(idx)
+                     for idx in self.boxes_in(option.exposedRect)]
+            if rects:
+                painter.setPen(self.pen)
+                painter.setBrush(self.brush)
+                painter.drawRects(rects)
+
+    def mousePressEvent(self, event):
+        idx = None
+        if event.button() == Qt.LeftButton:
+            idx = self.box_at(event.pos())
+        if idx is None:
+            # let items below (e.g. crop area) handle press
+            event.ignore()
+            return
+        self.boxClicked.emit(idx)
+        event.accept()
+
+    def hoverMoveEvent(self, event):
+        idx = self.box_at(event.pos())
+        self.setToolTip('' if idx is None else self.tooltips[idx])
+        super(BoxOverlay, self).hoverMoveEvent(event)
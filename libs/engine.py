@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright © Zdenko Podobný 2014-2017
+# Licensed under the terms of the Apache License Version 2.0
+
+""" Parallel OCR engines with initialized tesseract api per worker
+"""
+
+import os
+import sys
+import queue
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from libs import tesstool as tess
+from libs import lepttool as lept
+from libs import batch
+
+# State of worker process: libraries, api and OCR parameters
+_worker = {}
+
+
+def _init_worker(lang, tessdata_prefix, psm, ril, output_format):
+    """ Load libraries and initialize tesseract api once per worker process
+    """
+    tesseract = tess.get_tesseract(os.path.dirname(__file__))
+    leptonica = lept.get_leptonica()
+    if not tesseract or not leptonica:
+        raise RuntimeError('Tesseract or leptonica is not available')
+    api = tess.create_api(tesseract, lang, tessdata_prefix)
+    if not api:
+        raise RuntimeError('Could not initialize tesseract with language '
+                           '\'%s\'' % lang)
+    _worker.update(tesseract=tesseract, leptonica=leptonica, api=api,
+                   psm=psm, ril=ril, output_format=output_format)
+
+
+def check_api(lang, tessdata_prefix):
+    """ Initialize and release tesseract api with lang in this process,
+        raise RuntimeError if it fails (so workers would fail too)
+    """
+    tesseract = tess.get_tesseract(os.path.dirname(__file__))
+    if not tesseract or not lept.get_leptonica():
+        raise RuntimeError('Tesseract or leptonica is not available')
+    api = tess.create_api(tesseract, lang, tessdata_prefix)
+    if not api:
+        raise RuntimeError('Could not initialize tesseract with language '
+                           '\'%s\'' % lang)
+    tesseract.TessBaseAPIEnd(api)
+    tesseract.TessBaseAPIDelete(api)
+
+
+def _ocr_page(filename):
+    """ OCR one page in worker process
+    """
+    result = batch.ocr_file(_worker['tesseract'], _worker['leptonica'],
+                            _worker['api'], filename, _worker['psm'],
+                            _worker['ril'], _worker['output_format'])
+    if result is None:
+        raise IOError('Image %s can not be opened' % filename)
+    return result
+
+
+def _window_filler(filenames, pending, window, submit):
+    """ Return function which keeps up to window submitted jobs in pending
+    """
+    filenames = iter(filenames)
+
+    def fill():
+        while len(pending) < window:
+            filename = next(filenames, None)
+            if filename is None:
+                return
+            pending.append((filename, submit(filename)))
+    return fill
+
+
+class ProcessPoolEngine(object):
+    """ OCR pages in pool of processes, each one with its own initialized
+        tesseract api. Results are returned in input order.
+        Initialization of api is checked in this process first, so wrong
+        language fails immediately instead of breaking every worker.
+    """
+
+    def __init__(self, lang='eng', workers=None, tessdata_prefix=None,
+                 psm=tess.PSM.index('PSM_AUTO'),
+                 ril=tess.RIL.index('RIL_WORD'), output_format='txt',
+                 retries=1):
+        self.workers = workers or os.cpu_count() or 1
+        self.retries = retries
+        self._initargs = (lang, tessdata_prefix, psm, ril, output_format)
+        self._executor = None
+        check_api(lang, tessdata_prefix)
+
+    def _new_executor(self, workers):
+        return ProcessPoolExecutor(max_workers=workers,
+                                   initializer=_init_worker,
+                                   initargs=self._initargs)
+
+    def _retry(self, filename):
+        """ Run page on fresh worker process
+        """
+        executor = self._new_executor(1)
+        try:
+            return executor.submit(_ocr_page, filename).result()
+        finally:
+            executor.shutdown()
+
+    def map(self, filenames):
+        """ Yield (filename, result) for every page in order of filenames.
+            Result is None if page failed also after retries. RuntimeError
+            is raised if restarted pool breaks before it finishes any job.
+        """
+        if self._executor is None:
+            self._executor = self._new_executor(self.workers)
+        restarted = False  # pool was restarted and finished no job yet
+        pending = deque()
+        fill = _window_filler(filenames, pending, self.workers * 2,
+                              lambda name: self._executor.submit(_ocr_page,
+                                                                 name))
+        fill()
+        while pending:
+            filename, future = pending.popleft()
+            try:
+                result = future.result()
+                restarted = False
+            except BrokenProcessPool:
+                if restarted:
+                    raise RuntimeError('Worker processes crash before '
+                                       'finishing any page, giving up')
+                # Worker crashed => pages in flight are lost, restart pool
+                restarted = True
+                self._executor.shutdown(wait=False)
+                self._executor = self._new_executor(self.workers)
+                for idx, (name, _) in enumerate(pending):
+                    pending[idx] = (name,
+                                    self._executor.submit(_ocr_page, name))
+                result = self._retry_page(filename)
+            except Exception as err:  # pylint: disable=broad-except
+                print('OCR of %s failed: %s' % (filename, err),
+                      file=sys.stderr)
+                result = self._retry_page(filename)
+            yield filename, result
+            fill()
+
+    def _retry_page(self, filename):
+        """ Retry page up to self.retries times, return None on failure
+        """
+        for _ in range(self.retries):
+            try:
+                return self._retry(filename)
+            except Exception as err:  # pylint: disable=broad-except
+                print('Retry of %s failed: %s' % (filename, err),
+                      file=sys.stderr)
+        return None
+
+    def close(self):
+        """ Stop worker processes
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ThreadPoolEngine(object):
+    """ OCR pages in threads of one process. Libraries are loaded once and
+        shared, each job leases one of pre-initialized tesseract apis.
+        Native calls release the GIL, so pages are recognized in parallel.
+    """
+
+    def __init__(self, lang='eng', workers=None, tessdata_prefix=None,
+                 psm=tess.PSM.index('PSM_AUTO'),
+                 ril=tess.RIL.index('RIL_WORD'), output_format='txt'):
+        self.workers = workers or os.cpu_count() or 1
+        self.psm = psm
+        self.ril = ril
+        self.output_format = output_format
+        self.tesseract = tess.get_tesseract(os.path.dirname(__file__))
+        self.leptonica = lept.get_leptonica()
+        if not self.tesseract or not self.leptonica:
+            raise RuntimeError('Tesseract or leptonica is not available')
+        self._apis = queue.Queue()
+        self._all_apis = []
+        for _ in range(self.workers):
+            api = tess.create_api(self.tesseract, lang, tessdata_prefix)
+            if not api:
+                self.close()
+                raise RuntimeError('Could not initialize tesseract with '
+                                   'language \'%s\'' % lang)
+            self._all_apis.append(api)
+            self._apis.put(api)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers)
+
+    @contextmanager
+    def lease(self):
+        """ Borrow initialized api for one job and return it afterwards
+        """
+        api = self._apis.get()
+        try:
+            yield api
+        finally:
+            self._apis.put(api)
+
+    def ocr_page(self, filename):
+        """ OCR one page with leased api, return None on failure
+        """
+        with self.lease() as api:
+            return batch.ocr_file(self.tesseract, self.leptonica, api,
+                                  filename, self.psm, self.ril,
+                                  self.output_format)
+
+    def map(self, filenames):
+        """ Yield (filename, result) for every page in order of filenames
+        """
+        pending = deque()
+        fill = _window_filler(
+            filenames, pending, self.workers * 2,
+            lambda name: self._executor.submit(self.ocr_page, name))
+        fill()
+        while pending:
+            filename, future = pending.popleft()
+            try:
+                result = future.result()
+            except Exception as err:  # pylint: disable=broad-except
+                print('OCR of %s failed: %s' % (filename, err),
+                      file=sys.stderr)
+                result = None
+            yield filename, result
+            fill()
+
+    def close(self):
+        """ Wait for running jobs and release all apis
+        """
+        if getattr(self, '_executor', None) is not None:
+            self._executor.shutdown()
+            self._executor = None
+        while self._all_apis:
+            api = self._all_apis.pop()
+            self.tesseract.TessBaseAPIEnd(api)
+            self.tesseract.TessBaseAPIDelete(api)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
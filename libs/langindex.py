@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright © Zdenko Podobný 2014-2017
+# Licensed under the terms of the Apache License Version 2.0
+
+""" Persistent index of traineddata files in tessdata directory
+
+    Languages are listed without initializing tesseract. Size, mtime and
+    model type of every file are stored in JSON file; on refresh only
+    changed directories are listed and only changed files are read.
+
+    Usage: python -m libs.langindex [--path FILE] [--rebuild] [TESSDATA]
+"""
+
+import os
+import sys
+import json
+import struct
+import argparse
+
+from libs import tesstool as tess
+
+EXTENSION = '.traineddata'
+INDEX_VERSION = 1
+
+# Components in offset table of traineddata header (TessdataType)
+TESSDATA_INTTEMP = 3
+TESSDATA_LSTM = 17
+# Sanity limit of number of components (header of other file or endian)
+MAX_ENTRIES = 1000
+
+
+def default_index_path():
+    """ Return path of index file in user cache directory
+    """
+    if sys.platform == 'win32':
+        cache_dir = os.environ.get('LOCALAPPDATA',
+                                   os.path.expanduser('~'))
+    else:
+        cache_dir = os.environ.get('XDG_CACHE_HOME',
+                                   os.path.expanduser('~/.cache'))
+    return os.path.join(cache_dir, 'tesseract', 'pyTesseractDemo-langs.json')
+
+
+def get_tessdata_dir(tessdata_prefix=None):
+    """ Return tessdata directory
+        TESSDATA_PREFIX can point to tessdata or to its parent directory
+    """
+    if tessdata_prefix is None:
+        tessdata_prefix = tess.get_tessdata_prefix()
+    directory = os.path.join(tessdata_prefix, 'tessdata')
+    if os.path.isdir(directory):
+        return os.path.abspath(directory)
+    return os.path.abspath(tessdata_prefix)
+
+
+def read_model_type(path):
+    """ Return 'legacy', 'lstm', 'legacy+lstm' or 'unknown' from offset
+        table in header of traineddata file
+    """
+    try:
+        with open(path, 'rb') as traineddata:
+            header = traineddata.read(4)
+            if len(header) < 4:
+                return 'unknown'
+            for order in '<>':
+                entries = struct.unpack(order + 'i', header)[0]
+                if 0 < entries <= MAX_ENTRIES:
+                    break
+            else:
+                return 'unknown'
+            table = traineddata.read(8 * entries)
+    except OSError:
+        return 'unknown'
+    if len(table) < 8 * entries:
+        return 'unknown'
+    offsets = struct.unpack('%s%dq' % (order, entries), table)
+    legacy = entries > TESSDATA_INTTEMP and offsets[TESSDATA_INTTEMP] >= 0
+    lstm = entries > TESSDATA_LSTM and offsets[TESSDATA_LSTM] >= 0
+    if legacy and lstm:
+        return 'legacy+lstm'
+    if legacy:
+        return 'legacy'
+    if lstm:
+        return 'lstm'
+    return 'unknown'
+
+
+class LanguageIndex(object):
+    """ Index of traineddata files of one tessdata directory
+        entries is dictionary language -> {'size', 'mtime', 'type'}, language
+        of file in subdirectory is prefixed by it (e.g. 'script/Latin').
+    """
+
+    def __init__(self, tessdata_dir=None, path=None):
+        self.tessdata_dir = tessdata_dir or get_tessdata_dir()
+        self.path = path or default_index_path()
+        self.entries = {}
+        self.directories = {}  # relative path -> mtime
+        self.scanned = 0  # directories listed by last refresh
+        self.read = 0  # headers read by last refresh
+        self.load()
+
+    def load(self):
+        """ Load stored index of tessdata_dir, return False if there is none
+        """
+        try:
+            with open(self.path) as index_file:
+                data = json.load(index_file)
+        except (OSError, ValueError):
+            return False
+        if data.get('version') != INDEX_VERSION:
+            return False
+        stored = data.get('dirs', {}).get(self.tessdata_dir)
+        if not stored:
+            return False
+        self.entries = stored['entries']
+        self.directories = stored['directories']
+        return True
+
+    def save(self):
+        """ Store index, other tessdata directories in file are kept
+        """
+        data = {'version': INDEX_VERSION, 'dirs': {}}
+        try:
+            with open(self.path) as index_file:
+                stored = json.load(index_file)
+            if stored.get('version') == INDEX_VERSION:
+                data['dirs'] = stored.get('dirs', {})
+        except (OSError, ValueError):
+            pass
+        data['dirs'][self.tessdata_dir] = {'entries': self.entries,
+                                           'directories': self.directories}
+        directory = os.path.dirname(self.path)
+        try:
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w') as index_file:
+                json.dump(data, index_file, indent=1, sort_keys=True)
+            os.replace(temp_path, self.path)
+        except OSError as error:
+            print('Can not store language index:', error)
+            return False
+        return True
+
+    def _changed_directories(self):
+        """ Return relative paths of directories modified since last scan
+            (all of them if index is empty)
+        """
+        if not self.directories:
+            return ['']
+        changed = []
+        for relpath, mtime in self.directories.items():
+            try:
+                current = os.stat(os.path.join(self.tessdata_dir,
+                                               relpath)).st_mtime
+            except OSError:
+                current = None
+            if current != mtime:
+                changed.append(relpath)
+        return changed
+
+    def _scan(self, relpath):
+        """ Update entries of directory relpath, return relative paths of
+            its subdirectories
+        """
+        directory = os.path.join(self.tessdata_dir, relpath)
+        prefix = relpath.replace(os.sep, '/') + '/' if relpath else ''
+        # remove entries of directory (not of its subdirectories)
+        old = {lang: entry for lang, entry in self.entries.items()
+               if lang.startswith(prefix) and
+               '/' not in lang[len(prefix):]}
+        for lang in old:
+            del self.entries[lang]
+        self.directories.pop(relpath, None)
+        try:
+            self.directories[relpath] = os.stat(directory).st_mtime
+            items = list(os.scandir(directory))
+        except OSError:
+            return []
+        self.scanned += 1
+        subdirs = []
+        for item in items:
+            if item.is_dir():
+                subdirs.append(os.path.join(relpath, item.name))
+                continue
+            if not item.name.endswith(EXTENSION):
+                continue
+            lang = prefix + item.name[:-len(EXTENSION)]
+            stat = item.stat()
+            entry = old.get(lang)
+            if (entry is None or entry['size'] != stat.st_size or
+                    entry['mtime'] != stat.st_mtime):
+                entry = {'size': stat.st_size, 'mtime': stat.st_mtime,
+                         'type': read_model_type(item.path)}
+                self.read += 1
+            self.entries[lang] = entry
+        return subdirs
+
+    def refresh(self):
+        """ Update index from changed directories, store it if something
+            changed and return True in that case
+        """
+        self.scanned = 0
+        self.read = 0
+        pending = self._changed_directories()
+        if not pending:
+            return False
+        known = set(self.directories)
+        while pending:
+            relpath = pending.pop()
+            for subdir in self._scan(relpath):
+                if subdir not in known:
+                    known.add(subdir)
+                    pending.append(subdir)
+        self.save()
+        return True
+
+    def languages(self, model_type=None):
+        """ Return sorted list of languages, optionally only those whose
+            model type contains model_type ('legacy' or 'lstm')
+        """
+        return sorted(lang for lang, entry in self.entries.items()
+                      if model_type is None or
+                      model_type in entry['type'].split('+'))
+
+    def model_type(self, lang):
+        """ Return model type of language lang or None
+        """
+        entry = self.entries.get(lang)
+        return entry and entry['type']
+
+
+def get_languages(tessdata_prefix=None):
+    """ Return sorted list of languages in tessdata directory, index is
+        refreshed before
+    """
+    index = LanguageIndex(get_tessdata_dir(tessdata_prefix))
+    index.refresh()
+    return index.languages()
+
+
+def main(argv=None):
+    """ Refresh index and print languages with their model type
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m libs.langindex',
+        description='Index traineddata files of tessdata directory.')
+    parser.add_argument('tessdata', nargs='?', default=None,
+                        help='tessdata directory (default: from '
+                             'TESSDATA_PREFIX)')
+    parser.add_argument('--path', default=None,
+                        help='index file (default: %s)' %
+                        default_index_path())
+    parser.add_argument('--rebuild', action='store_true',
+                        help='ignore stored index and read all files')
+    args = parser.parse_args(argv)
+    index = LanguageIndex(get_tessdata_dir(args.tessdata), args.path)
+    if args.rebuild:
+        index.entries = {}
+        index.directories = {}
+    index.refresh()
+    for lang in index.languages():
+        entry = index.entries[lang]
+        print('%-24s %-12s %12d' % (lang, entry['type'], entry['size']))
+    print('%s: %d languages, %d directories listed, %d files read' %
+          (index.tessdata_dir, len(index.entries), index.scanned,
+           index.read), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
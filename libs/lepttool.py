@@ -10,19 +10,35 @@
 import os
 import sys
 import ctypes
+import hashlib
+import weakref
+from array import array
 
-from PyQt5.QtGui import (QImage, qRgb)
+from libs import bindings
+from libs import stats
 
+# numpy module, imported on first use (False means not imported yet)
+_numpy = False
 LIBPATH = "/usr/local/lib64/"
 LIBPATH_W = r'win32'
 
+# Leptonica library loaded by get_leptonica
+_library = None
+
 (L_INSERT, L_COPY, L_CLONE, L_COPY_CLONE) = map(ctypes.c_int, range(4))
 
+
+def _qrgb(red, green, blue):
+    """ Same value as QtGui.qRgb, without importing Qt
+    """
+    return 0xff000000 | (red << 16) | (green << 8) | blue
+
+
 # B&W Color Table.
-_bwCT = [qRgb(255, 255, 255), qRgb(0, 0, 0)]
+_bwCT = [_qrgb(255, 255, 255), _qrgb(0, 0, 0)]
 
 # Grayscale Color Table.
-_grayscaleCT = [qRgb(i, i, i) for i in range(256)]
+_grayscaleCT = [_qrgb(i, i, i) for i in range(256)]
 
 
 class BOX(ctypes.Structure):
@@ -40,13 +56,90 @@ class BOX(ctypes.Structure):
 BOX_PTR_T = ctypes.POINTER(BOX)
 
 
+class BOXA(ctypes.Structure):
+    """ Leptonica array of boxes structure
+    """
+    _fields_ = [
+        ("n", ctypes.c_int32),
+        ("nalloc", ctypes.c_int32),
+        ("refcount", ctypes.c_uint32),
+        ("box", ctypes.POINTER(ctypes.c_void_p))
+    ]
+
+
+def _get_numpy():
+    """ Import numpy on first use, return None if it is not installed
+    """
+    global _numpy
+    if _numpy is False:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        _numpy = numpy
+    return _numpy
+
+
+# numpy dtype of box table rows
+BOX_DTYPE = [('x', 'i4'), ('y', 'i4'), ('w', 'i4'), ('h', 'i4')]
+
+
+def boxa_geometry(boxa_pointer):
+    """ Return geometry of all boxes in BOXA as flat array('i') with
+        x, y, w, h of each box. Boxes are read directly from BOXA structure
+        without calling boxaGetBox.
+    """
+    if not boxa_pointer:
+        return array('i')
+    boxa = BOXA.from_address(boxa_pointer)
+    n_boxes = boxa.n
+    table = array('i', bytes(16 * n_boxes))
+    if not n_boxes:
+        return table
+    address = table.buffer_info()[0]
+    box_size = ctypes.sizeof(ctypes.c_int32) * 4
+    for idx, box in enumerate(boxa.box[:n_boxes]):
+        ctypes.memmove(address + idx * box_size, box, box_size)
+    return table
+
+
+def boxes_to_ndarray(table):
+    """ Return numpy structured array (x, y, w, h) over box table
+        without copying
+    """
+    numpy = _get_numpy()
+    if numpy is None:
+        raise ImportError('numpy is required for boxes_to_ndarray')
+    return numpy.frombuffer(table, dtype=BOX_DTYPE)
+
+
+def boxes_to_list(table):
+    """ Return box table as list of (x, y, w, h) tuples
+    """
+    # ndarray can exist only if numpy was already imported
+    numpy = sys.modules.get('numpy')
+    if numpy is not None and isinstance(table, numpy.ndarray):
+        return table.tolist()
+    items = iter(table)
+    return list(zip(items, items, items, items))
+
+
 def get_leptonica():
-    """ Get leptonica handle
+    """ Get leptonica handle, library is loaded only once per process
     """
+    global _library
+    if _library is None:
+        _library = _load_leptonica()
+    return _library
+
+
+def _load_leptonica():
+    """ Load leptonica library and declare its functions
+    """
+    curr_dir = os.path.dirname(os.path.realpath(__file__))
     if sys.platform == "win32":
         leptlib = os.path.join(LIBPATH_W, 'liblept170.dll')
         leptlib_alt = "liblept170.dll"
-        curr_dir = os.path.dirname(os.path.realpath(__file__))
         os.environ["PATH"] += os.pathsep + LIBPATH_W
         os.environ["PATH"] += os.pathsep + "{0}\{1}".format(curr_dir,
                                                             LIBPATH_W)
@@ -59,52 +152,314 @@ def get_leptonica():
     except OSError:
         try:
             leptonica = ctypes.cdll.LoadLibrary(leptlib_alt)
-        except WindowsError as err:
-            print("Loading of '%s from %s failed..." % (leptlib, curr_dir))
+        except OSError as err:
             print("Loading of '%s from %s failed..." % (leptlib, curr_dir))
+            print("Loading of '%s from %s failed..." % (leptlib_alt,
+                                                         curr_dir))
             print(os.environ["PATH"])
             print(curr_dir)
             print(err)
             return None
-    return leptonica
+    return stats.instrument(
+        bindings.declare(leptonica, bindings.LEPTONICA_PROTOTYPES),
+        'leptonica')
+
+
+def destroy_pix(leptonica, pix_image):
+    """ Release PIX created by leptonica
+    """
+    if pix_image:
+        leptonica.pixDestroy(ctypes.byref(ctypes.c_void_p(pix_image)))
+
+
+def pix_data(leptonica, pix_image):
+    """ Return memoryview of 32bit words over raster data of PIX without
+        copying. PIX must not be destroyed while the view is used.
+    """
+    n_words = (leptonica.pixGetWpl(pix_image) *
+               leptonica.pixGetHeight(pix_image))
+    data = leptonica.pixGetData(pix_image)
+    return memoryview((ctypes.c_uint32 * n_words).from_address(data))
+
+
+def pix_to_array(leptonica, pix_image):
+    """ Convert leptonica PIX to numpy array
+        32 bpp PIX => (height, width, 4) RGBA array, 8 bpp => (height, width)
+        gray array, 1 bpp => (height, width) array with 1 for black pixels.
+        32 bpp (and 8 bpp on big endian machines) is a view over PIX data
+        without copying, so PIX must not be destroyed while it is used.
+        Other depths are converted to 32 bpp and copied.
+    """
+    numpy = _get_numpy()
+    if numpy is None:
+        raise ImportError('numpy is required for pix_to_array')
+    width = leptonica.pixGetWidth(pix_image)
+    height = leptonica.pixGetHeight(pix_image)
+    depth = leptonica.pixGetDepth(pix_image)
+    wpl = leptonica.pixGetWpl(pix_image)
+
+    if depth not in (1, 8, 32) or (depth == 8 and
+                                   leptonica.pixGetColormap(pix_image)):
+        converted = leptonica.pixConvertTo32(pix_image)
+        try:
+            return pix_to_array(leptonica, converted).copy()
+        finally:
+            destroy_pix(leptonica, converted)
+
+    words = numpy.frombuffer(pix_data(leptonica, pix_image),
+                             dtype=numpy.uint32).reshape(height, wpl)
+    # Bytes of each word in order of pixels (most significant first)
+    raw = words.view(numpy.uint8).reshape(height, wpl, 4)
+    if sys.byteorder == 'little':
+        raw = raw[:, :, ::-1]
+    if depth == 32:
+        # words are 0xRRGGBBAA
+        return raw[:, :width, :]
+    raw = raw.reshape(height, wpl * 4)  # copy only on little endian
+    if depth == 8:
+        return raw[:, :width]
+    return numpy.unpackbits(raw, axis=1)[:, :width]
 
 
 def pix_to_qimage(leptonica, pix_image):
     """ Convert leptonica PIX to QT QImage
+        Pixels are copied once directly into buffer owned by QImage,
+        temporary PIXs are destroyed before return.
     """
-    # TODO(zdenop): 8509_001.4B.tif crash this -> implement PIX structure
+    # Qt is imported here so the rest of module can be used without it
+    from PyQt5.QtGui import QImage
+
     if not leptonica:
         return None
-    width = leptonica.pixGetWidth(pix_image)
-    height = leptonica.pixGetHeight(pix_image)
+    converted = None
     depth = leptonica.pixGetDepth(pix_image)
+    if depth not in (1, 8, 32) or (depth == 8 and
+                                   leptonica.pixGetColormap(pix_image)):
+        #  Convert other depths and colormapped images to 32
+        converted = leptonica.pixConvertTo32(pix_image)
+        if not converted:
+            print('Conversion of PIX to 32 bpp failed!!!')
+            return None
+        pix_image = converted
+        depth = 32
+    try:
+        with stats.timed('convert/pix_to_qimage'):
+            return _pix_to_qimage(leptonica, pix_image, depth, QImage)
+    finally:
+        destroy_pix(leptonica, converted)
 
+
+def _pix_to_qimage(leptonica, pix_image, depth, QImage):
+    width = leptonica.pixGetWidth(pix_image)
+    height = leptonica.pixGetHeight(pix_image)
     if depth == 1:
         image_format = QImage.Format_Mono
     elif depth == 8:
         image_format = QImage.Format_Indexed8
-    elif depth == 32:
-        image_format = QImage.Format_RGB32
     else:
-        #  Convert other depths to 32
-        pix_image = leptonica.pixConvertTo32(pix_image)
-        image_format = QImage.Format_RGB32
-
-    bytes_per_line = leptonica.pixGetWpl(pix_image) * 4
-    image_datas = leptonica.pixEndianByteSwapNew(pix_image)
-    datas = leptonica.pixGetData(image_datas)
-
-    result = QImage(datas, width, height, bytes_per_line, image_format)
+        # leptonica RGB pixel is 0xRRGGBBAA => R, G, B, A bytes after swap
+        image_format = QImage.Format_RGBX8888
 
-    result.setColorTable(_grayscaleCT)  # (depth == 8)
+    result = QImage(width, height, image_format)
+    if result.isNull():
+        print('Invalid format!!!')
+        return QImage(0, 0, QImage.Format_Invalid)
     if depth == 1:
         result.setColorTable(_bwCT)
+    elif depth == 8:
+        result.setColorTable(_grayscaleCT)
+
+    numpy = _get_numpy()
+    swapped = None
+    src_bpl = leptonica.pixGetWpl(pix_image) * 4
+    dst_bpl = result.bytesPerLine()
+    if sys.byteorder == 'little' and numpy is None:
+        swapped = leptonica.pixEndianByteSwapNew(pix_image)
+        src = leptonica.pixGetData(swapped)
+    else:
+        src = leptonica.pixGetData(pix_image)
+    dst = int(result.bits())
+    try:
+        if src_bpl == dst_bpl:
+            ctypes.memmove(dst, src, src_bpl * height)
+        else:
+            for line in range(height):
+                ctypes.memmove(dst + line * dst_bpl, src + line * src_bpl,
+                               min(src_bpl, dst_bpl))
+    finally:
+        destroy_pix(leptonica, swapped)
+    if sys.byteorder == 'little' and swapped is None:
+        # Swap bytes of words in place inside of QImage buffer
+        words = (ctypes.c_uint32 * (dst_bpl * height // 4)).from_address(dst)
+        numpy.ctypeslib.as_array(words).byteswap(True)
+    stats.count('bytes_converted', dst_bpl * height)
+    return result
+
+
+def _destroy(leptonica, destroy_name, address):
+    """ Call leptonica destroy function with pointer to object address
+    """
+    getattr(leptonica, destroy_name)(ctypes.byref(ctypes.c_void_p(address)))
 
-    if result.isNull():
-        none = QImage(0, 0, QImage.Format_Invalid)
-        print('Invalid format!!!')
-        return none
-    return result.rgbSwapped()
+
+class LeptObject(object):
+    """ Owner of leptonica object released by destroy function when closed,
+        at the end of with block or when garbage collected.
+        Instance can be passed directly to ctypes functions.
+    """
+    destroy_name = None
+
+    def __init__(self, leptonica, pointer):
+        self.leptonica = leptonica
+        self._as_parameter_ = ctypes.c_void_p(pointer)
+        if pointer:
+            self._finalizer = weakref.finalize(
+                self, _destroy, leptonica, self.destroy_name,
+                self._as_parameter_.value)
+        else:
+            self._finalizer = None
+
+    @property
+    def pointer(self):
+        """ Address of wrapped object, None if it is NULL or released
+        """
+        return self._as_parameter_.value
+
+    def __bool__(self):
+        return bool(self._as_parameter_.value)
+
+    def close(self):
+        """ Release wrapped object
+        """
+        if self._finalizer is not None:
+            self._finalizer()
+            self._finalizer = None
+        self._as_parameter_ = ctypes.c_void_p()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Pix(LeptObject):
+    """ Leptonica PIX released with pixDestroy
+    """
+    destroy_name = 'pixDestroy'
+
+    @classmethod
+    def read(cls, leptonica, filename):
+        """ Read image file, result is false if reading failed
+        """
+        return cls(leptonica, leptonica.pixRead(filename.encode()))
+
+    @property
+    def width(self):
+        return self.leptonica.pixGetWidth(self)
+
+    @property
+    def height(self):
+        return self.leptonica.pixGetHeight(self)
+
+    @property
+    def depth(self):
+        return self.leptonica.pixGetDepth(self)
+
+    @property
+    def xres(self):
+        return self.leptonica.pixGetXRes(self)
+
+    @property
+    def yres(self):
+        return self.leptonica.pixGetYRes(self)
+
+    def clip(self, box):
+        """ Return new Pix with area of box
+        """
+        return Pix(self.leptonica,
+                   self.leptonica.pixClipRectangle(self, box, None))
+
+    def clone(self):
+        """ Return new reference to the same PIX (data are not copied)
+        """
+        return Pix(self.leptonica, self.leptonica.pixClone(self))
+
+    def scale(self, factor):
+        """ Return new Pix scaled by factor, 1 bpp images are scaled down
+            to grayscale to keep them readable
+        """
+        if factor < 1 and self.depth == 1:
+            return Pix(self.leptonica,
+                       self.leptonica.pixScaleToGray(self, factor))
+        return Pix(self.leptonica,
+                   self.leptonica.pixScale(self, factor, factor))
+
+    def rotate_orth(self, quads):
+        """ Return new Pix rotated clockwise by quads * 90 degrees
+        """
+        return Pix(self.leptonica,
+                   self.leptonica.pixRotateOrth(self, quads % 4))
+
+    def to_qimage(self):
+        """ Convert to QImage
+        """
+        return pix_to_qimage(self.leptonica, self.pointer)
+
+    def digest(self):
+        """ Return SHA-1 hex digest of image size, depth and raster data
+        """
+        sha = hashlib.sha1(('%dx%dx%d' % (self.width, self.height,
+                                          self.depth)).encode())
+        sha.update(pix_data(self.leptonica, self.pointer))
+        return sha.hexdigest()
+
+
+class Box(LeptObject):
+    """ Leptonica BOX released with boxDestroy
+    """
+    destroy_name = 'boxDestroy'
+
+    @classmethod
+    def create(cls, leptonica, x, y, w, h):
+        """ Create new box
+        """
+        return cls(leptonica, leptonica.boxCreate(x, y, w, h))
+
+    @property
+    def geometry(self):
+        """ Return (x, y, w, h) of box
+        """
+        box = BOX.from_address(self.pointer)
+        return box.x, box.y, box.w, box.h
+
+
+class Boxa(LeptObject):
+    """ Leptonica BOXA released with boxaDestroy
+    """
+    destroy_name = 'boxaDestroy'
+
+    def __len__(self):
+        if not self:
+            return 0
+        return self.leptonica.boxaGetCount(self)
+
+    def __getitem__(self, index):
+        """ Return clone of box on position index
+        """
+        if not 0 <= index < len(self):
+            raise IndexError('Boxa index out of range')
+        return Box(self.leptonica,
+                   self.leptonica.boxaGetBox(self, index, L_CLONE))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def geometry(self):
+        """ Return geometry of all boxes as flat array('i') of x, y, w, h
+        """
+        return boxa_geometry(self.pointer)
 
 
 def get_version(leptonica=None):
@@ -113,8 +468,6 @@ def get_version(leptonica=None):
     if not leptonica:
         leptonica = get_leptonica()
     if leptonica:
-        leptonica.getLeptonicaVersion.restype = ctypes.c_char_p
-        leptonica.getLeptonicaVersion.argtypes = []
         return leptonica.getLeptonicaVersion().decode('utf-8')
     return None
 
@@ -125,8 +478,6 @@ def get_image_support(leptonica=None):
     if not leptonica:
         leptonica = get_leptonica()
     if leptonica:
-        leptonica.getImagelibVersions.restype = ctypes.c_char_p
-        leptonica.getImagelibVersions.argtypes = []
         return leptonica.getImagelibVersions().decode('utf-8')
     return None
 
@@ -149,17 +500,17 @@ def main():
     if os.path.exists(file_name) == False:
         print("File {} does not exists. There is nothing to check."
               .format(file_name))
-    pix_image = leptonica.pixRead(file_name.encode())
+    pix_image = Pix.read(leptonica, file_name)
     if pix_image:
-        print('w', leptonica.pixGetWidth(pix_image))
-        print('h', leptonica.pixGetHeight(pix_image))
-        print('d', leptonica.pixGetDepth(pix_image))
+        print('w', pix_image.width)
+        print('h', pix_image.height)
+        print('d', pix_image.depth)
     else:
         print('Image can not be openned')
         sys.exit()
 
-    qimage = QImage()
-    qimage = pix_to_qimage(leptonica, pix_image)
+    with pix_image:
+        qimage = pix_image.to_qimage()
     if qimage:
         qimage.save(r'..\images\test.png')
     else:
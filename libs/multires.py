@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright © Zdenko Podobný 2014-2017
+# Licensed under the terms of the Apache License Version 2.0
+
+""" Layout analysis on downscaled image, recognition at full resolution
+
+    Usage: python -m libs.multires [-l LANG] [--dpi DPI] image...
+    compares runtime and text of single and two resolution pipelines.
+"""
+
+import os
+import sys
+import time
+import difflib
+import argparse
+
+from libs import tesstool as tess
+from libs import lepttool as lept
+
+# Resolution sufficient for page segmentation
+LAYOUT_DPI = 150
+
+
+def layout_scale(xres, yres, target_dpi=LAYOUT_DPI):
+    """ Return factor downscaling image with resolution xres x yres to
+        target_dpi. Images with unknown or lower resolution are not scaled.
+    """
+    resolution = min(xres, yres)
+    if not target_dpi or resolution <= target_dpi:
+        return 1.0
+    return target_dpi / resolution
+
+
+def scale_boxes(boxes, factor, width, height):
+    """ Map boxes (x, y, w, h) found on image scaled by factor back to
+        image of width x height. Boxes are rounded outwards so no pixel of
+        component is lost.
+    """
+    mapped = []
+    for x, y, w, h in boxes:
+        left = max(0, int(x / factor))
+        top = max(0, int(y / factor))
+        right = min(width, int((x + w) / factor + 0.999))
+        bottom = min(height, int((y + h) / factor + 0.999))
+        mapped.append((left, top, right - left, bottom - top))
+    return mapped
+
+
+def get_layout_boxes(tesseract, api, pix_image, psm, ril,
+                     target_dpi=LAYOUT_DPI):
+    """ Find components on level ril with layout analysis of pix_image
+        downscaled to target_dpi and return their boxes in coordinates of
+        pix_image. Full resolution pix_image is set to api afterwards.
+    """
+    factor = layout_scale(pix_image.xres, pix_image.yres, target_dpi)
+    scaled = pix_image.scale(factor) if factor < 1 else pix_image.clone()
+    if not scaled:
+        print('Scaling of image for layout analysis failed...')
+        factor = 1.0
+        scaled = pix_image.clone()
+    with scaled:
+        tesseract.TessBaseAPIClear(api)
+        tesseract.TessBaseAPISetImage2(api, scaled)
+        tesseract.TessBaseAPISetPageSegMode(api, psm)
+        with lept.Boxa(pix_image.leptonica, tess.get_component_images(
+                tesseract, api, ril)) as boxa:
+            boxes = lept.boxes_to_list(boxa.geometry())
+    tesseract.TessBaseAPISetImage2(api, pix_image)
+    if factor < 1:
+        boxes = scale_boxes(boxes, factor, pix_image.width,
+                            pix_image.height)
+    return boxes
+
+
+def iter_multires_results(tesseract, api, pix_image, psm, ril,
+                          target_dpi=LAYOUT_DPI):
+    """ Find components on downscaled image and recognize them at full
+        resolution
+    """
+    boxes = get_layout_boxes(tesseract, api, pix_image, psm, ril,
+                             target_dpi)
+    return tess.iter_rectangle_results(tesseract, api, boxes, ril)
+
+
+def run_timed(tesseract, api, pix_image, psm, ril, target_dpi):
+    """ Return (layout seconds, total seconds, results) of pipeline,
+        target_dpi 0 means layout analysis at full resolution
+    """
+    start = time.perf_counter()
+    boxes = get_layout_boxes(tesseract, api, pix_image, psm, ril,
+                             target_dpi)
+    layout = time.perf_counter() - start
+    results = list(tess.iter_rectangle_results(tesseract, api, boxes, ril))
+    return layout, time.perf_counter() - start, results
+
+
+def main(argv=None):
+    """ Benchmark two resolution pipeline against single resolution one
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m libs.multires',
+        description='Compare layout analysis at full and reduced '
+                    'resolution.')
+    parser.add_argument('images', nargs='+')
+    parser.add_argument('-l', '--lang', default='eng')
+    parser.add_argument('--psm', default='PSM_AUTO', choices=tess.PSM)
+    parser.add_argument('--ril', default='RIL_TEXTLINE', choices=tess.RIL)
+    parser.add_argument('--dpi', type=int, default=LAYOUT_DPI,
+                        help='resolution of layout analysis (default: %d)' %
+                        LAYOUT_DPI)
+    args = parser.parse_args(argv)
+
+    tesseract = tess.get_tesseract(os.path.dirname(__file__))
+    leptonica = lept.get_leptonica()
+    if not tesseract or not leptonica:
+        print('Tesseract or leptonica is not available')
+        return 1
+    api = tess.create_api(tesseract, args.lang)
+    if not api:
+        return 1
+    psm = tess.PSM.index(args.psm)
+    ril = tess.RIL.index(args.ril)
+    try:
+        for filename in args.images:
+            with lept.Pix.read(leptonica, filename) as pix_image:
+                if not pix_image:
+                    print('Image %s can not be read' % filename)
+                    continue
+                print('%s: %dx%d, %d dpi, layout scale %.3f' %
+                      (filename, pix_image.width, pix_image.height,
+                       pix_image.xres, layout_scale(
+                           pix_image.xres, pix_image.yres, args.dpi)))
+                single = run_timed(tesseract, api, pix_image, psm, ril, 0)
+                multi = run_timed(tesseract, api, pix_image, psm, ril,
+                                  args.dpi)
+                for name, (layout, total, results) in (('single', single),
+                                                       ('multi', multi)):
+                    print('  %-6s layout %.3fs, total %.3fs, %d boxes, '
+                          'mean confidence %.1f' %
+                          (name, layout, total, len(results),
+                           sum(result.conf for result in results) /
+                           max(len(results), 1)))
+                similarity = difflib.SequenceMatcher(
+                    None, '\n'.join(result.text for result in single[2]),
+                    '\n'.join(result.text for result in multi[2])).ratio()
+                print('  text similarity %.3f, layout speedup %.1fx' %
+                      (similarity, single[0] / max(multi[0], 1e-9)))
+    finally:
+        tesseract.TessBaseAPIEnd(api)
+        tesseract.TessBaseAPIDelete(api)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright © Zdenko Podobný 2014-2017
+# Licensed under the terms of the Apache License Version 2.0
+
+""" OCR worker running recognition outside of GUI thread
+"""
+
+import time
+
+from PyQt5.QtCore import (Qt, QObject, QThread, pyqtSignal, pyqtSlot)
+
+from libs import tesstool as tess
+from libs import lepttool as lept
+from libs import multires
+from libs import stats
+
+
+class OcrWorker(QObject):
+    """ Recognize image already set in api and emit results in batches
+        With segment_only only layout is analysed and results have no text
+        (confidence -1) unless they are known. If boxes (x, y, w, h) are
+        given, only they are recognized (with psm if it is given).
+        Components are found on pix_image downscaled to layout_dpi if both
+        are given. Results of boxes in known (dictionary (x, y, w, h) ->
+        BoxResult) are reused instead of recognition.
+    """
+    # list of tesstool.BoxResult
+    resultsReady = pyqtSignal(list)
+    # message about found components
+    message = pyqtSignal(str)
+    # number of results, True if job was cancelled
+    finished = pyqtSignal(int, bool)
+
+    # Emit results at least after batch_size results or batch_interval sec
+    batch_size = 200
+    batch_interval = 0.1
+
+    def __init__(self, tesseract, leptonica, api, ril, single_pass,
+                 segment_only=False, boxes=None, pix_image=None,
+                 layout_dpi=0, psm=None, known=None, parent=None):
+        super(OcrWorker, self).__init__(parent)
+        self.tesseract = tesseract
+        self.leptonica = leptonica
+        self.api = api
+        self.ril = ril
+        self.single_pass = single_pass
+        self.segment_only = segment_only
+        self.boxes = boxes
+        self.pix_image = pix_image
+        self.layout_dpi = layout_dpi
+        self.psm = psm
+        self.known = known or {}
+        self.reused = 0
+        self.monitor = tess.Monitor(tesseract)
+
+    def cancel(self):
+        """ Stop job after current component (or cancel recognition of page
+            if tesseract supports it)
+        """
+        self.monitor.cancel()
+
+    @property
+    def cancelled(self):
+        return self.monitor.cancelled
+
+    def iter_results(self):
+        """ Run layout analysis (or recognition of whole page in single
+            pass) and return iterator of results
+        """
+        if self.boxes is not None:
+            return self.iter_box_results(self.boxes)
+        if self.segment_only:
+            with stats.timed('ocr/layout'):
+                boxes = list(tess.iter_layout_boxes(self.tesseract, self.api,
+                                                    self.ril))
+            return self._iter_layout_results(boxes)
+        if self.single_pass:
+            # layout and recognition are done by one native call
+            with stats.timed('ocr/single_pass'):
+                if self.tesseract.TessBaseAPIRecognize(self.api,
+                                                       self.monitor):
+                    if not self.cancelled:
+                        self.message.emit('Recognition failed...')
+                    return iter(())
+            return tess.iter_recognized_results(self.tesseract, self.api,
+                                                self.ril)
+        with stats.timed('ocr/layout'):
+            if self.pix_image is not None and self.layout_dpi:
+                boxes = multires.get_layout_boxes(
+                    self.tesseract, self.api, self.pix_image,
+                    self.tesseract.TessBaseAPIGetPageSegMode(self.api),
+                    self.ril, self.layout_dpi)
+            else:
+                with lept.Boxa(self.leptonica, tess.get_component_images(
+                        self.tesseract, self.api, self.ril)) as boxa:
+                    boxes = lept.boxes_to_list(boxa.geometry())
+        if not boxes:
+            self.message.emit('No component found. Try to change PSM or '
+                              'RIL.')
+        else:
+            self.message.emit('<span style="color:green">Found %d image '
+                              'components.</span>' % len(boxes))
+        return self.iter_box_results(boxes)
+
+    def _iter_layout_results(self, boxes):
+        """ Yield boxes found by layout analysis, box without known result
+            has confidence -1 and no text
+        """
+        for box in boxes:
+            result = self.known.get(tuple(box))
+            if result is None:
+                result = tess.BoxResult(*box, conf=-1, text='')
+            else:
+                self.reused += 1
+            yield result
+        stats.count('boxes_reused', self.reused)
+
+    def iter_box_results(self, boxes):
+        """ Recognize boxes which are not known and yield results of all
+            boxes in original order
+        """
+        if not self.known:
+            return tess.iter_rectangle_results(self.tesseract, self.api,
+                                               boxes, self.ril, self.psm)
+        return self._iter_known_results(boxes)
+
+    def _iter_known_results(self, boxes):
+        missing = [box for box in boxes if tuple(box) not in self.known]
+        recognized = tess.iter_rectangle_results(self.tesseract, self.api,
+                                                 missing, self.ril, self.psm)
+        for box in boxes:
+            result = self.known.get(tuple(box))
+            if result is None:
+                result = next(recognized)
+            else:
+                self.reused += 1
+            yield result
+        stats.count('boxes_reused', self.reused)
+
+    @pyqtSlot()
+    def run(self):
+        """ Run OCR job
+        """
+        count = 0
+        try:
+            # layout stage is timed inside, recognition of boxes is lazy
+            results = self.iter_results()
+            with stats.timed('ocr/recognition'):
+                count = self.emit_results(results)
+        finally:
+            self.monitor.close()
+            self.finished.emit(count, self.cancelled)
+
+    def emit_results(self, results):
+        """ Emit results in batches, return their number
+        """
+        count = 0
+        batch = []
+        last_emit = time.monotonic()
+        for result in results:
+            if self.cancelled:
+                break
+            batch.append(result)
+            count += 1
+            now = time.monotonic()
+            if (len(batch) >= self.batch_size or
+                    now - last_emit >= self.batch_interval):
+                self.resultsReady.emit(batch)
+                batch = []
+                last_emit = now
+        if batch:
+            self.resultsReady.emit(batch)
+        stats.count('boxes', count)
+        return count
+
+
+def start_worker(worker):
+    """ Move worker to new thread and start it. Thread is returned and it
+        quits when worker is finished.
+    """
+    thread = QThread()
+    worker.moveToThread(thread)
+    thread.started.connect(worker.run)
+    # quit is thread safe, direct connection lets thread.wait() be used in
+    # slots connected to finished signal
+    worker.finished.connect(thread.quit, Qt.DirectConnection)
+    thread.start()
+    return thread
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright © Zdenko Podobný 2014-2017
+# Licensed under the terms of the Apache License Version 2.0
+
+""" Selection of OCR language for every page by detected script
+
+    Orientation and script of page are detected with 'osd' model on
+    downscaled copy of page (PSM_OSD_ONLY). Page is then recognized by api
+    of language mapped to script (e.g. 'Cyrillic=rus', or combined model
+    'Latin=eng+deu'); pages with unreliable detection use fallback language.
+
+    Usage: python -m libs.osdrouter [-l FALLBACK] [--map MAP] images
+"""
+
+import sys
+import argparse
+
+from libs import tesstool as tess
+from libs import lepttool as lept
+from libs import multires
+from libs import stats
+from libs.apicache import APICache
+from libs.pagesource import PageSource
+
+# Language used for scripts detected by osd model
+SCRIPT_LANGS = {
+    'Latin': 'eng',
+    'Cyrillic': 'rus',
+    'Greek': 'ell',
+    'Arabic': 'ara',
+    'Hebrew': 'heb',
+    'Devanagari': 'hin',
+    'Bengali': 'ben',
+    'Tamil': 'tam',
+    'Thai': 'tha',
+    'Armenian': 'hye',
+    'Georgian': 'kat',
+    'Han': 'chi_sim',
+    'Japanese': 'jpn',
+    'Katakana': 'jpn',
+    'Hiragana': 'jpn',
+    'Korean': 'kor',
+    'Hangul': 'kor',
+    'Fraktur': 'frk',
+}
+
+# Resolution of page copy used for detection
+OSD_DPI = 150
+# Detections with lower confidence are ignored
+MIN_SCRIPT_CONF = 1.0
+MIN_ORIENTATION_CONF = 2.0
+
+
+def parse_script_langs(text):
+    """ Return SCRIPT_LANGS updated by text like 'Latin=eng+deu,Han=chi_tra'
+    """
+    script_langs = dict(SCRIPT_LANGS)
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        script, sep, lang = item.partition('=')
+        if not sep or not lang.strip():
+            raise ValueError('Invalid script mapping \'%s\'' % item)
+        script_langs[script.strip()] = lang.strip()
+    return script_langs
+
+
+class OsdRouter(object):
+    """ Choose api for page by its script. Apis (including 'osd' one) are
+        taken from APICache, so each language is initialized only once.
+    """
+
+    def __init__(self, api_cache, fallback_lang='eng', script_langs=None,
+                 tessdata_prefix=None, target_dpi=OSD_DPI):
+        self.api_cache = api_cache
+        self.tesseract = api_cache.tesseract
+        self.fallback_lang = fallback_lang
+        self.script_langs = script_langs or dict(SCRIPT_LANGS)
+        self.tessdata_prefix = tessdata_prefix
+        self.target_dpi = target_dpi
+        self.routed = {}  # lang -> number of pages
+
+    def is_available(self):
+        """ Return True if tesseract can detect script and osd model exists
+        """
+        return (hasattr(self.tesseract,
+                        'TessBaseAPIDetectOrientationScript') and
+                tess.find_traineddata('osd', self.tessdata_prefix)
+                is not None)
+
+    def preload(self, langs=None):
+        """ Initialize apis of langs (default: fallback and languages of
+            all mapped scripts with installed traineddata) up to capacity
+            of api cache
+        """
+        if langs is None:
+            langs = [self.fallback_lang] + sorted(
+                set(self.script_langs.values()) - {self.fallback_lang})
+        loaded = []
+        for lang in langs:
+            if len(loaded) + 1 >= self.api_cache.capacity:
+                break  # keep place for osd api
+            if all(tess.find_traineddata(name, self.tessdata_prefix)
+                   for name in lang.split('+')):
+                if self.api_cache.get(lang, self.tessdata_prefix):
+                    loaded.append(lang)
+        return loaded
+
+    def detect(self, pix_image):
+        """ Return tesstool.OsdResult of pix_image or None
+        """
+        api = self.api_cache.get('osd', self.tessdata_prefix)
+        if not api:
+            return None
+        factor = multires.layout_scale(pix_image.xres, pix_image.yres,
+                                       self.target_dpi)
+        scaled = pix_image.scale(factor) if factor < 1 else pix_image.clone()
+        if not scaled:
+            return None
+        with scaled, stats.timed('osd/detect'):
+            self.tesseract.TessBaseAPIClear(api)
+            self.tesseract.TessBaseAPISetImage2(api, scaled)
+            self.tesseract.TessBaseAPISetPageSegMode(api, tess.PSM_OSD_ONLY)
+            return tess.detect_orientation_script(self.tesseract, api)
+
+    def select_lang(self, osd):
+        """ Return language for detected osd (fallback_lang for None or
+            unreliable detection)
+        """
+        if osd is None or osd.script_conf < MIN_SCRIPT_CONF:
+            return self.fallback_lang
+        return self.script_langs.get(osd.script, self.fallback_lang)
+
+    def route(self, pix_image):
+        """ Return (lang, api, osd) for pix_image, api is None if neither
+            selected nor fallback language can be initialized
+        """
+        osd = self.detect(pix_image)
+        lang = self.select_lang(osd)
+        api = self.api_cache.get(lang, self.tessdata_prefix)
+        if not api and lang != self.fallback_lang:
+            print('Could not initialize tesseract with language \'%s\', '
+                  '\'%s\' is used.' % (lang, self.fallback_lang))
+            lang = self.fallback_lang
+            api = self.api_cache.get(lang, self.tessdata_prefix)
+        self.routed[lang] = self.routed.get(lang, 0) + 1
+        stats.count('osd/lang/' + lang)
+        return lang, api, osd
+
+
+def upright(pix_image, osd):
+    """ Return new Pix rotated to upright position according to osd or
+        None if rotation is not needed (or detection is unreliable)
+    """
+    if (osd is None or not osd.orientation or
+            osd.orientation_conf < MIN_ORIENTATION_CONF):
+        return None
+    return pix_image.rotate_orth((360 - osd.orientation) // 90)
+
+
+def main(argv=None):
+    """ Print detected orientation, script and selected language of pages
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m libs.osdrouter',
+        description='Detect orientation and script of pages and select '
+                    'OCR language.')
+    parser.add_argument('images', nargs='+')
+    parser.add_argument('-l', '--lang', default='eng',
+                        help='fallback language (default: eng)')
+    parser.add_argument('--map', default='',
+                        help="script mapping, e.g. 'Latin=eng+deu'")
+    parser.add_argument('--tessdata-prefix', default=None)
+    args = parser.parse_args(argv)
+
+    tesseract = tess.get_tesseract()
+    leptonica = lept.get_leptonica()
+    if not tesseract or not leptonica:
+        print('Tesseract or leptonica is not available', file=sys.stderr)
+        return 1
+    api_cache = APICache(tesseract)
+    router = OsdRouter(api_cache, args.lang, parse_script_langs(args.map),
+                       args.tessdata_prefix)
+    if not router.is_available():
+        print('Script detection is not available (tesseract %s or missing '
+              'osd.traineddata)' % tess.VERSION, file=sys.stderr)
+        api_cache.clear()
+        return 1
+    try:
+        for filename in args.images:
+            with PageSource(leptonica, filename) as source:
+                for page_no, pix_image in enumerate(source):
+                    with pix_image:
+                        osd = router.detect(pix_image)
+                    if osd is None:
+                        print('%s [%d]: detection failed -> %s' %
+                              (filename, page_no + 1, args.lang))
+                        continue
+                    print('%s [%d]: orientation %d (%.2f), script %s '
+                          '(%.2f) -> %s' %
+                          (filename, page_no + 1, osd.orientation,
+                           osd.orientation_conf, osd.script,
+                           osd.script_conf, router.select_lang(osd)))
+    finally:
+        api_cache.clear()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
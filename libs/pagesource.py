@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright © Zdenko Podobný 2014-2017
+# Licensed under the terms of the Apache License Version 2.0
+
+""" Lazy access to pages of (multipage) image files
+"""
+
+import sys
+import ctypes
+import ctypes.util
+from concurrent.futures import ThreadPoolExecutor
+
+from libs import lepttool as lept
+
+
+def _fclose(leptonica, stream):
+    """ Close FILE* opened by leptonica
+    """
+    if hasattr(leptonica, 'lept_fclose'):
+        leptonica.lept_fclose(stream)
+    else:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'))
+        libc.fclose.argtypes = [ctypes.c_void_p]
+        libc.fclose(stream)
+
+
+def _close_result(future):
+    """ Release Pix of finished future
+    """
+    if future.exception() is None:
+        future.result().close()
+
+
+def get_page_count(leptonica, filename):
+    """ Return number of pages of TIFF file, 1 for other formats
+    """
+    stream = leptonica.fopenReadStream(filename.encode())
+    if not stream:
+        return 0
+    try:
+        n_pages = ctypes.c_int(0)
+        if leptonica.tiffGetCount(stream, ctypes.byref(n_pages)):
+            return 1  # not a TIFF file
+        return n_pages.value
+    finally:
+        _fclose(leptonica, stream)
+
+
+class PageSource(object):
+    """ Pages of image file decoded only when they are requested
+        Multipage TIFF pages are read with pixReadFromMultipageTiff from
+        directory offset stored when previous page was read, so pages read
+        in order are not found by walking directory chain from start.
+        Other pages are read with pixReadTiff, other formats have one page
+        read with pixRead. Returned Pix objects are owned by caller.
+    """
+
+    def __init__(self, leptonica, filename):
+        self.leptonica = leptonica
+        self.filename = filename
+        self.n_pages = get_page_count(leptonica, filename)
+        self._executor = None
+        self._prefetched = {}  # page number -> future of Pix
+        self._offsets = {0: 0}  # page number -> offset of TIFF directory
+
+    def __len__(self):
+        return self.n_pages
+
+    def read_page(self, page_no):
+        """ Decode page page_no (counted from 0)
+        """
+        if not 0 <= page_no < self.n_pages:
+            raise IndexError('Page %d is out of range' % page_no)
+        if self.n_pages == 1:
+            return lept.Pix.read(self.leptonica, self.filename)
+        offset = self._offsets.get(page_no)
+        if (offset is None or
+                not hasattr(self.leptonica, 'pixReadFromMultipageTiff')):
+            return lept.Pix(self.leptonica, self.leptonica.pixReadTiff(
+                self.filename.encode(), page_no))
+        offset = ctypes.c_size_t(offset)
+        pix_image = lept.Pix(self.leptonica,
+                             self.leptonica.pixReadFromMultipageTiff(
+                                 self.filename.encode(), ctypes.byref(offset)))
+        if offset.value:  # 0 after last page
+            self._offsets[page_no + 1] = offset.value
+        return pix_image
+
+    def __getitem__(self, page_no):
+        future = self._prefetched.pop(page_no, None)
+        if future is not None:
+            return future.result()
+        return self.read_page(page_no)
+
+    def __iter__(self):
+        """ Yield pages one by one, next page is decoded in background
+        """
+        for page_no in range(self.n_pages):
+            # take page out of pending prefetch before next one is started,
+            # prefetch() drops other prefetched pages
+            pix_image = self[page_no]
+            self.prefetch(page_no + 1)
+            yield pix_image
+
+    def prefetch(self, page_no):
+        """ Start decoding of page page_no in background thread
+            Only one page is kept prefetched.
+        """
+        if not 0 <= page_no < self.n_pages or page_no in self._prefetched:
+            return
+        self._drop_prefetched()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+        self._prefetched[page_no] = self._executor.submit(self.read_page,
+                                                          page_no)
+
+    def _drop_prefetched(self):
+        """ Cancel prefetching, page which is being decoded is released
+            when it is done (without waiting for it)
+        """
+        while self._prefetched:
+            _, future = self._prefetched.popitem()
+            if not future.cancel():
+                future.add_done_callback(_close_result)
+
+    def close(self):
+        """ Release prefetched page and background thread
+        """
+        self._drop_prefetched()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main():
+    """ Print number of pages and their sizes
+    """
+    leptonica = lept.get_leptonica()
+    if not leptonica:
+        print("Leptonica was not initialized! Quiting...")
+        sys.exit(-1)
+    for filename in sys.argv[1:]:
+        with PageSource(leptonica, filename) as source:
+            print('%s: %d page(s)' % (filename, len(source)))
+            for page_no, pix_image in enumerate(source):
+                with pix_image:
+                    print('  page %d: %dx%d, depth %d' %
+                          (page_no + 1, pix_image.width, pix_image.height,
+                           pix_image.depth))
+
+
+if __name__ == '__main__':
+    main()
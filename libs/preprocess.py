@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright © Zdenko Podobný 2014-2017
+# Licensed under the terms of the Apache License Version 2.0
+
+""" Chain of leptonica preprocessing steps with memoized intermediate images
+
+    Chain is described by text like 'gray,sauvola:window=31,deskew', i.e.
+    comma separated step names with optional colon separated parameters.
+
+    Usage: python -m libs.preprocess CHAIN input output
+"""
+
+import sys
+import json
+import ctypes
+import hashlib
+import inspect
+from collections import OrderedDict
+
+from libs import lepttool as lept
+
+# pixSelectBySize constants
+L_SELECT_IF_EITHER = 3
+L_SELECT_IF_GTE = 4
+
+# pixWrite format
+IFF_PNG = 3
+
+
+def _to_gray(pix_image):
+    """ Return 8 bpp copy of pix_image
+    """
+    return lept.Pix(pix_image.leptonica,
+                    pix_image.leptonica.pixConvertTo8(pix_image, 0))
+
+
+def _to_binary(pix_image, threshold=128):
+    """ Return 1 bpp copy of pix_image
+    """
+    if pix_image.depth == 1:
+        return pix_image.clone()
+    return lept.Pix(pix_image.leptonica,
+                    pix_image.leptonica.pixConvertTo1(pix_image, threshold))
+
+
+def step_gray(pix_image):
+    """ Convert to 8 bpp grayscale
+    """
+    return _to_gray(pix_image)
+
+
+def step_sauvola(pix_image, window=25, factor=0.35):
+    """ Binarize with Sauvola local thresholding
+    """
+    if pix_image.depth == 1:
+        return pix_image.clone()
+    binary = ctypes.c_void_p()
+    with _to_gray(pix_image) as gray:
+        if gray:
+            pix_image.leptonica.pixSauvolaBinarizeTiled(
+                gray, int(window), float(factor), 1, 1, None,
+                ctypes.byref(binary))
+    return lept.Pix(pix_image.leptonica, binary.value)
+
+
+def step_otsu(pix_image, tile=2000, score=0.1):
+    """ Binarize with (adaptive) Otsu thresholding
+    """
+    if pix_image.depth == 1:
+        return pix_image.clone()
+    binary = ctypes.c_void_p()
+    with _to_gray(pix_image) as gray:
+        if gray:
+            pix_image.leptonica.pixOtsuAdaptiveThreshold(
+                gray, int(tile), int(tile), 0, 0, float(score), None,
+                ctypes.byref(binary))
+    return lept.Pix(pix_image.leptonica, binary.value)
+
+
+def step_deskew(pix_image, reduction=0):
+    """ Find skew angle and rotate image (reduction 0 is default of
+        leptonica)
+    """
+    return lept.Pix(pix_image.leptonica,
+                    pix_image.leptonica.pixDeskew(pix_image, int(reduction)))
+
+
+def step_despeckle(pix_image, size=3):
+    """ Remove connected components smaller than size in both dimensions
+    """
+    with _to_binary(pix_image) as binary:
+        return lept.Pix(pix_image.leptonica,
+                        pix_image.leptonica.pixSelectBySize(
+                            binary, int(size), int(size), 8,
+                            L_SELECT_IF_EITHER, L_SELECT_IF_GTE, None))
+
+
+def step_scale(pix_image, factor=1.0):
+    """ Scale image by factor
+    """
+    return pix_image.scale(float(factor))
+
+
+def step_border(pix_image):
+    """ Remove dark components touching image border (scanner borders)
+    """
+    with _to_binary(pix_image) as binary:
+        return lept.Pix(pix_image.leptonica,
+                        pix_image.leptonica.pixRemoveBorderConnComps(
+                            binary, 8))
+
+
+STEPS = {
+    'gray': step_gray,
+    'sauvola': step_sauvola,
+    'otsu': step_otsu,
+    'deskew': step_deskew,
+    'despeckle': step_despeckle,
+    'scale': step_scale,
+    'border': step_border,
+}
+
+
+def parse_steps(text):
+    """ Return list of (name, parameters) from chain description
+    """
+    steps = []
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        name, *params = item.split(':')
+        if name not in STEPS:
+            raise ValueError('Unknown preprocessing step \'%s\'' % name)
+        valid = list(inspect.signature(STEPS[name]).parameters)[1:]
+        parameters = {}
+        for param in params:
+            key, _, value = param.partition('=')
+            key = key.strip()
+            if key not in valid:
+                raise ValueError('Unknown parameter \'%s\' of step \'%s\' '
+                                 '(valid: %s)' % (key, name,
+                                                  ', '.join(valid) or 'none'))
+            try:
+                parameters[key] = float(value)
+            except ValueError:
+                raise ValueError('Invalid value of parameter \'%s\' of step '
+                                 '\'%s\'' % (key, name)) from None
+        steps.append((name, parameters))
+    return steps
+
+
+def format_steps(steps):
+    """ Return chain description of steps
+    """
+    return ','.join(':'.join([name] + ['%s=%g' % item
+                                       for item in sorted(params.items())])
+                    for name, params in steps)
+
+
+class Preprocessor(object):
+    """ Apply chain of steps to PIX. Result of every step is kept in LRU
+        cache keyed by input image hash and parameters of all steps up to
+        it, so change of last step recomputes only that step.
+    """
+
+    def __init__(self, leptonica, steps=(), max_images=16):
+        self.leptonica = leptonica
+        self.steps = list(steps)
+        self.max_images = max_images
+        self.images = OrderedDict()  # key -> Pix
+        self.computed = 0
+        self.reused = 0
+
+    def __bool__(self):
+        return bool(self.steps)
+
+    def stage_keys(self, image_hash):
+        """ Return cache keys of results of all steps
+        """
+        keys = []
+        key = image_hash
+        for step in self.steps:
+            key = hashlib.sha1((key + json.dumps(step, sort_keys=True))
+                               .encode()).hexdigest()
+            keys.append(key)
+        return keys
+
+    def run(self, pix_image, image_hash=None):
+        """ Return new Pix with result of chain or None if step failed
+            image_hash is digest of pix_image (computed if not given).
+        """
+        if image_hash is None:
+            image_hash = pix_image.digest()
+        keys = self.stage_keys(image_hash)
+        current = pix_image
+        start = 0
+        for idx in reversed(range(len(keys))):
+            if keys[idx] in self.images:
+                self.images.move_to_end(keys[idx])
+                current = self.images[keys[idx]]
+                start = idx + 1
+                self.reused += 1
+                break
+        for (name, params), key in zip(self.steps[start:], keys[start:]):
+            result = STEPS[name](current, **params)
+            if not result:
+                print('Preprocessing step \'%s\' failed...' % name)
+                return None
+            self.computed += 1
+            self.images[key] = result
+            while len(self.images) > self.max_images:
+                self.images.popitem(last=False)[1].close()
+            current = result
+        return current.clone()
+
+    def close(self):
+        """ Release cached images
+        """
+        for image in self.images.values():
+            image.close()
+        self.images.clear()
+
+
+def main(argv=None):
+    """ Apply chain to image and write result as PNG
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 3:
+        print(__doc__)
+        return 1
+    leptonica = lept.get_leptonica()
+    if not leptonica:
+        print('Leptonica is not available')
+        return 1
+    preprocessor = Preprocessor(leptonica, parse_steps(argv[0]))
+    with lept.Pix.read(leptonica, argv[1]) as pix_image:
+        if not pix_image:
+            print('Image %s can not be read' % argv[1])
+            return 1
+        result = preprocessor.run(pix_image)
+    preprocessor.close()
+    if result is None:
+        return 1
+    with result:
+        if leptonica.pixWrite(argv[2].encode(), result, IFF_PNG):
+            print('Writing of %s failed' % argv[2])
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright © Zdenko Podobný 2014-2017
+# Licensed under the terms of the Apache License Version 2.0
+
+""" Persistent cache of OCR results keyed by image content and parameters
+
+    Usage: python -m libs.resultcache [--stats] [--clear] [--path FILE]
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+
+from libs import tesstool as tess
+
+# Default limit of cache size in bytes
+MAX_SIZE = 256 * 1024 * 1024
+
+SCHEMA = '''CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    image_hash TEXT NOT NULL,
+    data BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL)'''
+
+
+def default_cache_path():
+    """ Return path of cache database in user cache directory
+    """
+    if sys.platform == 'win32':
+        cache_dir = os.environ.get('LOCALAPPDATA',
+                                   os.path.expanduser('~'))
+    else:
+        cache_dir = os.environ.get('XDG_CACHE_HOME',
+                                   os.path.expanduser('~/.cache'))
+    return os.path.join(cache_dir, 'tesseract', 'pyTesseractDemo-ocr.sqlite')
+
+
+def make_key(image_hash, rect=None, lang='', psm=0, ril=0, mode='',
+             variables=None):
+    """ Return cache key of OCR job
+        rect is (x, y, w, h) of recognized area or None for whole image,
+        mode distinguishes recognition methods returning different results,
+        variables are tesseract variables set to non default values.
+    """
+    description = json.dumps([image_hash, rect and list(rect), lang, psm,
+                              ril, mode, tess.VERSION,
+                              sorted((variables or {}).items())])
+    return hashlib.sha1(description.encode()).hexdigest()
+
+
+class ResultCache(object):
+    """ SQLite store of OCR results (lists of tesstool.BoxResult)
+        Least recently used results are removed when size of stored
+        results exceeds max_size bytes.
+    """
+
+    def __init__(self, path=None, max_size=MAX_SIZE):
+        self.path = path or default_cache_path()
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute(SCHEMA)
+        self.connection.execute('CREATE INDEX IF NOT EXISTS accessed_idx '
+                                'ON results (accessed)')
+        self.connection.commit()
+
+    def get(self, key):
+        """ Return list of BoxResult stored for key or None
+        """
+        row = self.connection.execute(
+            'SELECT data FROM results WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        with self.connection:
+            self.connection.execute(
+                'UPDATE results SET accessed = ? WHERE key = ?',
+                (time.time(), key))
+        return [tess.BoxResult(*item) for item in json.loads(row[0])]
+
+    def put(self, key, image_hash, results):
+        """ Store results for key
+        """
+        data = json.dumps([list(result) for result in results]).encode()
+        with self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO results '
+                '(key, image_hash, data, size, accessed) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (key, image_hash, data, len(data), time.time()))
+        self.evict()
+
+    def size(self):
+        """ Return size of stored results in bytes
+        """
+        return self.connection.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+
+    def evict(self):
+        """ Remove least recently used results above max_size
+        """
+        excess = self.size() - self.max_size
+        if excess <= 0:
+            return
+        removed = 0
+        keys = []
+        for key, size in self.connection.execute(
+                'SELECT key, size FROM results ORDER BY accessed'):
+            if removed >= excess:
+                break
+            keys.append((key,))
+            removed += size
+        with self.connection:
+            self.connection.executemany('DELETE FROM results WHERE key = ?',
+                                        keys)
+
+    def invalidate(self, image_hash=None):
+        """ Remove results of image_hash or all results if it is None
+        """
+        with self.connection:
+            if image_hash is None:
+                self.connection.execute('DELETE FROM results')
+            else:
+                self.connection.execute(
+                    'DELETE FROM results WHERE image_hash = ?', (image_hash,))
+        self.connection.execute('VACUUM')
+
+    def stats(self):
+        """ Return dictionary with cache statistics
+        """
+        count = self.connection.execute(
+            'SELECT COUNT(*) FROM results').fetchone()[0]
+        return {'hits': self.hits, 'misses': self.misses, 'entries': count,
+                'size': self.size(), 'max_size': self.max_size}
+
+    def close(self):
+        self.connection.close()
+
+
+def main(argv=None):
+    """ Show statistics or clear cache
+    """
+    parser = argparse.ArgumentParser(prog='python -m libs.resultcache',
+                                     description='Manage OCR result cache.')
+    parser.add_argument('--path', default=None,
+                        help='cache database (default: %s)' %
+                        default_cache_path())
+    parser.add_argument('--clear', action='store_true',
+                        help='remove all cached results')
+    parser.add_argument('--stats', action='store_true',
+                        help='print cache statistics')
+    args = parser.parse_args(argv)
+    cache = ResultCache(args.path)
+    try:
+        if args.clear:
+            cache.invalidate()
+            print('Cache %s was cleared.' % cache.path)
+        if args.stats or not args.clear:
+            stats = cache.stats()
+            print('%s: %d entries, %d of %d bytes' %
+                  (cache.path, stats['entries'], stats['size'],
+                   stats['max_size']))
+    finally:
+        cache.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
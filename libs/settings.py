@@ -52,6 +52,29 @@ def readSetting(name):
         return str(settings.value(name, r'images/phototest.tif'))
     elif name == 'images/zoom_factor':
         return float(settings.value(name, QVariant(1.0)))
+    elif name == 'api_cache/capacity':
+        return int(settings.value(name, 4))
+    elif name == 'api_cache/max_memory_mb':
+        return int(settings.value(name, 1024))
+    elif name == 'result_cache/max_size_mb':
+        return int(settings.value(name, 256))
+    elif name == 'single_pass':
+        return str(settings.value(name, 'true')).lower() == 'true'
+    elif name == 'layout_dpi':
+        return int(settings.value(name, 150))
+    elif name == 'preprocess':
+        return str(settings.value(name, ''))
+    elif name == 'stats/enabled':
+        return str(settings.value(name, 'false')).lower() == 'true'
+    elif name == 'segment_only':
+        return str(settings.value(name, 'false')).lower() == 'true'
+    elif name == 'incremental':
+        return str(settings.value(name, 'false')).lower() == 'true'
+    elif name == 'osd/route':
+        return str(settings.value(name, 'false')).lower() == 'true'
+    elif name == 'osd/script_langs':
+        # e.g. 'Latin=eng+deu,Cyrillic=rus', see osdrouter.SCRIPT_LANGS
+        return str(settings.value(name, ''))
     elif name == 'language':
         # default value 'eng'
         return str(settings.value(name, 'eng'))
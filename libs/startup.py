@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright © Zdenko Podobný 2014-2017
+# Licensed under the terms of the Apache License Version 2.0
+
+""" Loading of libraries, first image and tesseract api outside of GUI
+    thread, so main window is shown immediately
+"""
+
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
+
+from libs import tesstool as tess
+from libs import lepttool as lept
+from libs import stats
+from libs import langindex
+from libs.apicache import APICache
+from libs.pagesource import PageSource
+
+
+class StartupWorker(QObject):
+    """ Load leptonica, decode first page of image_name, list languages,
+        load tesseract and initialize api for lang. Every step is reported
+        by its signal as soon as it is done.
+    """
+    # leptonica library or None
+    leptonicaReady = pyqtSignal(object)
+    # PageSource, Pix of first page
+    imageReady = pyqtSignal(object, object)
+    # tesseract library or None, APICache, api or None
+    tesseractReady = pyqtSignal(object, object, object)
+    # list of available languages
+    languagesReady = pyqtSignal(list)
+    finished = pyqtSignal()
+
+    def __init__(self, search_path, lang, image_name, api_cache_capacity,
+                 api_cache_memory, parent=None):
+        super(StartupWorker, self).__init__(parent)
+        self.search_path = search_path
+        self.lang = lang
+        self.image_name = image_name
+        self.api_cache_capacity = api_cache_capacity
+        self.api_cache_memory = api_cache_memory
+
+    @pyqtSlot()
+    def run(self):
+        """ Run all startup steps
+        """
+        try:
+            with stats.timed('startup/leptonica'):
+                leptonica = lept.get_leptonica()
+            self.leptonicaReady.emit(leptonica)
+            if leptonica and self.image_name:
+                with stats.timed('startup/image'):
+                    source = PageSource(leptonica, self.image_name)
+                    if len(source):
+                        pix_image = source[0]
+                    else:
+                        pix_image = lept.Pix(leptonica, None)
+                self.imageReady.emit(source, pix_image)
+            # tessdata index does not need tesseract
+            with stats.timed('startup/languages'):
+                languages = langindex.get_languages()
+            self.languagesReady.emit(languages)
+            with stats.timed('startup/tesseract'):
+                tesseract = tess.get_tesseract(self.search_path)
+            if not tesseract:
+                self.tesseractReady.emit(None, None, None)
+                return
+            api_cache = APICache(tesseract, self.api_cache_capacity,
+                                 self.api_cache_memory)
+            with stats.timed('startup/init'):
+                api = api_cache.get(self.lang)
+            self.tesseractReady.emit(tesseract, api_cache, api)
+        finally:
+            self.finished.emit()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright © Zdenko Podobný 2014-2017
+# Licensed under the terms of the Apache License Version 2.0
+
+""" Timing and counters of OCR stages and native calls
+
+    Collecting is disabled by default. When it is disabled timed() returns
+    shared no-op context manager, count() and add_time() return immediately
+    and libraries are not wrapped, so instrumentation costs only a function
+    call.
+    enable() must be called before tesseract and leptonica are loaded to
+    time their native calls.
+"""
+
+import re
+import json
+import time
+import threading
+
+_enabled = False
+_lock = threading.Lock()
+_timings = {}  # name -> [calls, total seconds, max seconds]
+_counters = {}  # name -> value
+
+
+def enable(flag=True):
+    """ Switch collecting of statistics on or off
+    """
+    global _enabled
+    _enabled = flag
+
+
+def is_enabled():
+    return _enabled
+
+
+def add_time(name, seconds):
+    """ Record one call of name lasting seconds
+    """
+    if not _enabled:
+        return
+    with _lock:
+        timing = _timings.get(name)
+        if timing is None:
+            _timings[name] = [1, seconds, seconds]
+        else:
+            timing[0] += 1
+            timing[1] += seconds
+            if seconds > timing[2]:
+                timing[2] = seconds
+
+
+def count(name, value=1):
+    """ Increase counter name by value
+    """
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+class _Timer(object):
+    """ Context manager recording duration of with block
+    """
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        add_time(self.name, time.perf_counter() - self.start)
+
+
+class _NoTimer(object):
+    """ Context manager doing nothing
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NO_TIMER = _NoTimer()
+
+
+def timed(name):
+    """ Return context manager recording duration of stage name
+    """
+    return _Timer(name) if _enabled else _NO_TIMER
+
+
+class InstrumentedLibrary(object):
+    """ Proxy of ctypes library timing every called function as
+        'prefix/function name'
+    """
+
+    def __init__(self, library, prefix):
+        self._library = library
+        self._prefix = prefix
+
+    def __getattr__(self, name):
+        function = getattr(self._library, name)
+        stat_name = '%s/%s' % (self._prefix, name)
+
+        def call(*args):
+            start = time.perf_counter()
+            try:
+                return function(*args)
+            finally:
+                add_time(stat_name, time.perf_counter() - start)
+        call.__name__ = name
+        call.function = function
+        # cache wrapper, __getattr__ is not called for it next time
+        setattr(self, name, call)
+        return call
+
+
+def instrument(library, prefix):
+    """ Return library wrapped for timing of native calls if collecting is
+        enabled, otherwise library itself
+    """
+    if not _enabled or library is None:
+        return library
+    return InstrumentedLibrary(library, prefix)
+
+
+def reset():
+    """ Remove all recorded values
+    """
+    with _lock:
+        _timings.clear()
+        _counters.clear()
+
+
+def snapshot():
+    """ Return recorded values as dictionary suitable for JSON
+    """
+    with _lock:
+        timings = {name: {'calls': calls, 'total': total, 'max': maximum}
+                   for name, (calls, total, maximum) in _timings.items()}
+        counters = dict(_counters)
+    return {'timings': timings, 'counters': counters}
+
+
+def to_json(data=None):
+    """ Return statistics as JSON text
+    """
+    return json.dumps(data or snapshot(), indent=1, sort_keys=True)
+
+
+def _metric_name(name):
+    return re.sub('[^a-zA-Z0-9_]', '_', name)
+
+
+def to_prometheus(data=None, prefix='pytesseractdemo'):
+    """ Return statistics in Prometheus text exposition format
+    """
+    data = data or snapshot()
+    lines = ['# TYPE %s_duration_seconds summary' % prefix]
+    for name, timing in sorted(data['timings'].items()):
+        lines.append('%s_duration_seconds_sum{stage="%s"} %.9f' %
+                     (prefix, name, timing['total']))
+        lines.append('%s_duration_seconds_count{stage="%s"} %d' %
+                     (prefix, name, timing['calls']))
+    for name, value in sorted(data['counters'].items()):
+        metric = '%s_%s_total' % (prefix, _metric_name(name))
+        lines.append('# TYPE %s counter' % metric)
+        lines.append('%s %s' % (metric, value))
+    return '\n'.join(lines) + '\n'
+
+
+def format_table(data=None):
+    """ Return statistics as plain text table
+    """
+    data = data or snapshot()
+    lines = ['%-48s %8s %10s %10s %10s' %
+             ('stage', 'calls', 'total ms', 'mean ms', 'max ms')]
+    for name, timing in sorted(data['timings'].items(),
+                               key=lambda item: -item[1]['total']):
+        lines.append('%-48s %8d %10.2f %10.3f %10.3f' %
+                     (name, timing['calls'], timing['total'] * 1000,
+                      timing['total'] * 1000 / timing['calls'],
+                      timing['max'] * 1000))
+    for name, value in sorted(data['counters'].items()):
+        lines.append('%-48s %8s' % (name, value))
+    return '\n'.join(lines)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright © Zdenko Podobný 2014-2017
+# Licensed under the terms of the Apache License Version 2.0
+
+""" Dialog showing timing and counters collected by libs.stats
+"""
+
+from PyQt5.QtCore import QTimer, pyqtSlot
+from PyQt5.QtGui import QFontDatabase
+from PyQt5.QtWidgets import (QCheckBox, QDialog, QDialogButtonBox,
+                             QFileDialog, QPlainTextEdit, QVBoxLayout)
+
+from libs import stats
+import libs.settings as sett
+
+
+class StatsDialog(QDialog):
+    """ Non modal panel with statistics refreshed every second
+    """
+
+    def __init__(self, parent=None):
+        super(StatsDialog, self).__init__(parent)
+        self.setWindowTitle('Statistics')
+        self.resize(760, 480)
+        self.checkBoxEnabled = QCheckBox(
+            'Collect statistics (timing of native calls needs restart)')
+        self.checkBoxEnabled.setChecked(stats.is_enabled())
+        self.checkBoxEnabled.toggled.connect(self.set_enabled)
+        self.textView = QPlainTextEdit()
+        self.textView.setReadOnly(True)
+        self.textView.setFont(QFontDatabase.systemFont(
+            QFontDatabase.FixedFont))
+        buttons = QDialogButtonBox(QDialogButtonBox.Close)
+        buttons.addButton('Reset', QDialogButtonBox.ResetRole) \
+            .clicked.connect(self.reset)
+        buttons.addButton('Export...', QDialogButtonBox.ActionRole) \
+            .clicked.connect(self.export)
+        buttons.rejected.connect(self.close)
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.checkBoxEnabled)
+        layout.addWidget(self.textView)
+        layout.addWidget(buttons)
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        self.refresh()
+        self.timer.start(1000)
+        super(StatsDialog, self).showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super(StatsDialog, self).hideEvent(event)
+
+    @pyqtSlot()
+    def refresh(self):
+        """ Show current statistics
+        """
+        if not stats.is_enabled():
+            self.textView.setPlainText('Collecting of statistics is '
+                                       'disabled.')
+            return
+        scroll = self.textView.verticalScrollBar().value()
+        self.textView.setPlainText(stats.format_table())
+        self.textView.verticalScrollBar().setValue(scroll)
+
+    @pyqtSlot(bool)
+    def set_enabled(self, enabled):
+        stats.enable(enabled)
+        sett.storeSetting('stats/enabled', enabled)
+        self.refresh()
+
+    @pyqtSlot()
+    def reset(self):
+        stats.reset()
+        self.refresh()
+
+    @pyqtSlot()
+    def export(self):
+        """ Save statistics as JSON or Prometheus text (*.prom)
+        """
+        filename, _ = QFileDialog.getSaveFileName(
+            self, 'Export statistics', 'stats.json',
+            'JSON (*.json);;Prometheus text (*.prom)')
+        if not filename:
+            return
+        if filename.endswith('.prom'):
+            text = stats.to_prometheus()
+        else:
+            text = stats.to_json()
+        with open(filename, 'w') as output:
+            output.write(text)
@@ -7,17 +7,29 @@
 """
 
 import os
+import re
 import sys
 import ctypes
+import locale
+import weakref
+from collections import namedtuple
 from ctypes.util import find_library
 from itertools import count
 
+from libs import bindings
+from libs import stats
+
 LIBPATH = '/usr/local/lib64/'
 VERSION = ''
 
+# Tesseract library loaded by get_tesseract
+_library = None
+
 # Define Page Iterator Levels
 RIL = ['RIL_BLOCK', 'RIL_PARA', 'RIL_TEXTLINE', 'RIL_WORD', 'RIL_SYMBOL']
 
+(RIL_BLOCK, RIL_PARA, RIL_TEXTLINE, RIL_WORD, RIL_SYMBOL) = range(5)
+
 # Page Segmentation Modes
 PSM = [
     'PSM_OSD_ONLY',
@@ -39,6 +51,23 @@ PSM = [
  PSM_SINGLE_WORD, PSM_CIRCLE_WORD, PSM_SINGLE_CHAR, PSM_SPARSE_TEXT,
  PSM_SPARSE_TEXT_OSD, PSM_COUNT) = map(ctypes.c_int, range(14))
 
+# OCR Engine Modes
+OEM = [
+    'OEM_TESSERACT_ONLY',
+    'OEM_LSTM_ONLY',
+    'OEM_TESSERACT_LSTM_COMBINED',
+    'OEM_DEFAULT']
+
+(OEM_TESSERACT_ONLY, OEM_LSTM_ONLY, OEM_TESSERACT_LSTM_COMBINED,
+ OEM_DEFAULT) = range(4)
+
+# Result of recognition of one page component
+BoxResult = namedtuple('BoxResult', ['x', 'y', 'w', 'h', 'conf', 'text'])
+# Result of orientation and script detection, orientation is clockwise
+# rotation of page in degrees (0, 90, 180, 270)
+OsdResult = namedtuple('OsdResult', ['orientation', 'orientation_conf',
+                                     'script', 'script_conf'])
+
 
 def iter_ptr_list(plist):
     """ Iterator for pointer list - to parse C array
@@ -60,7 +89,16 @@ def get_tessdata_prefix():
 
 
 def get_tesseract(search_path='.'):
-    """ Get tesseract handle
+    """ Get tesseract handle, library is loaded only once per process
+    """
+    global _library
+    if _library is None:
+        _library = _load_tesseract(search_path)
+    return _library
+
+
+def _load_tesseract(search_path):
+    """ Load tesseract library and declare its functions
     """
     if sys.platform == 'win32':
         lib_name = 'libtesseract303'
@@ -88,6 +126,8 @@ def get_tesseract(search_path='.'):
             print(err)
             return
 
+    bindings.declare(tesseract, bindings.TESSERACT_PROTOTYPES)
+    tesseract = stats.instrument(tesseract, 'tesseract')
     global VERSION
     VERSION = get_version(tesseract)
     return tesseract
@@ -100,47 +140,283 @@ def get_version(tesseract=None):
         tesseract = get_tesseract()
     if not tesseract:
         return
-
-    tesseract.TessVersion.restype = ctypes.c_char_p
-    tesseract.TessVersion.argtypes = []
     return tesseract.TessVersion().decode('utf-8')
 
 
+def version_info(version=None):
+    """ Return (major, minor) of version (default: VERSION of loaded
+        tesseract), e.g. (3, 5) for '3.05.02' or (5, 0) for '5.0.0-alpha'
+    """
+    numbers = re.findall(r'\d+', version if version is not None else VERSION)
+    return tuple(int(number) for number in (numbers + ['0', '0'])[:2])
+
+
 def get_list_of_langs(tesseract=None, api=None):
-    """ Get tesseract version
+    """ Get list of available languages
+        Without initialized api languages are taken from index of tessdata
+        directory, so no tesseract api is created just to list them.
     """
-    not_inited = False
+    if not api:
+        from libs import langindex
+        return langindex.get_languages()
     if not tesseract:
         tesseract = get_tesseract()
-        not_inited = True
         if not tesseract:
             return
-    if not api:
-        api = tesseract.TessBaseAPICreate()
 
     # check if tesseract was inited => list of languages is availabe only after
     # tesseract init
-    tesseract.TessBaseAPIGetInitLanguagesAsString.restype = ctypes.c_char_p
     init_lang = tesseract.TessBaseAPIGetInitLanguagesAsString(api)
     if not init_lang:
-        try:
-            tesseract.TessBaseAPIInit3(api, None, None)
-        except OSError as error:
-            print('Can not initialize tesseract:', error)
-            return None
-
-    get_langs = tesseract.TessBaseAPIGetAvailableLanguagesAsVector
-    get_langs.restype = ctypes.POINTER(ctypes.c_char_p)
-    langs_p = get_langs(api)
+        return None
+
+    langs_p = tesseract.TessBaseAPIGetAvailableLanguagesAsVector(api)
     langs = []
     if langs_p:
         for lang in iter_ptr_list(langs_p):
             langs.append(lang.decode('utf-8'))
-    if not_inited:
-        tesseract.TessBaseAPIEnd(api)
+        tesseract.TessDeleteTextArray(langs_p)
     return sorted(langs)
 
 
+def find_traineddata(lang, tessdata_prefix=None):
+    """ Return path to traineddata file of language lang or None
+        TESSDATA_PREFIX can point to tessdata or to its parent directory
+    """
+    if tessdata_prefix is None:
+        tessdata_prefix = get_tessdata_prefix()
+    for directory in (os.path.join(tessdata_prefix, 'tessdata'),
+                      tessdata_prefix):
+        path = os.path.join(directory, lang + '.traineddata')
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def create_api(tesseract, lang, tessdata_prefix=None, oem=None):
+    """ Create tesseract api initialized for language lang
+        Engine mode oem is used only if it is not None
+        Return None if initialization failed
+    """
+    if tessdata_prefix is None:
+        tessdata_prefix = get_tessdata_prefix()
+    api = ctypes.c_void_p(tesseract.TessBaseAPICreate())
+    # Tesseract requires C locale for parsing of its parameters
+    locale.setlocale(locale.LC_ALL, 'C')
+    if oem is None:
+        retc = tesseract.TessBaseAPIInit3(api, tessdata_prefix.encode(),
+                                          lang.encode())
+    else:
+        retc = tesseract.TessBaseAPIInit2(api, tessdata_prefix.encode(),
+                                          lang.encode(), oem)
+    if retc:
+        tesseract.TessBaseAPIDelete(api)
+        print('Could not initialize tesseract with language \'%s\'.' % lang)
+        return None
+    return api
+
+
+def get_ocr_psm(ril):
+    """ Return page segmentation mode suitable for OCR of single component
+        on level ril
+    """
+    if ril == RIL_TEXTLINE:
+        return PSM_SINGLE_LINE
+    elif ril == RIL_WORD:
+        return PSM_SINGLE_WORD
+    elif ril == RIL_SYMBOL:
+        return PSM_SINGLE_CHAR
+    return PSM_SINGLE_BLOCK
+
+
+def get_component_images(tesseract, api, ril, text_only=True):
+    """ Return pointer to leptonica BOXA with components on level ril
+        Caller is responsible for releasing it (e.g. with lepttool.Boxa)
+    """
+    return tesseract.TessBaseAPIGetComponentImages(api, ril, int(text_only),
+                                                   None, None)
+
+
+class TessText(object):
+    """ Text allocated by tesseract, released with TessDeleteText when
+        closed, at the end of with block or when garbage collected
+    """
+
+    def __init__(self, tesseract, text_p):
+        self._text_p = text_p
+        if text_p:
+            self._finalizer = weakref.finalize(self, tesseract.TessDeleteText,
+                                               text_p)
+        else:
+            self._finalizer = None
+
+    def __str__(self):
+        if not self._text_p:
+            return ''
+        return ctypes.string_at(self._text_p).decode('utf-8')
+
+    def close(self):
+        """ Release text
+        """
+        if self._finalizer is not None:
+            self._finalizer()
+            self._finalizer = None
+        self._text_p = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def get_text(tesseract, text_p):
+    """ Decode text returned by tesseract and release its memory
+    """
+    with TessText(tesseract, text_p) as text:
+        return str(text).strip()
+
+
+def detect_orientation_script(tesseract, api):
+    """ Return OsdResult for image set in api or None if detection failed
+        or is not supported by tesseract. Api must be initialized with
+        'osd' language.
+    """
+    if not hasattr(tesseract, 'TessBaseAPIDetectOrientationScript'):
+        return None
+    orientation = ctypes.c_int(0)
+    orientation_conf = ctypes.c_float(0)
+    script = ctypes.c_char_p()
+    script_conf = ctypes.c_float(0)
+    if not tesseract.TessBaseAPIDetectOrientationScript(
+            api, ctypes.byref(orientation), ctypes.byref(orientation_conf),
+            ctypes.byref(script), ctypes.byref(script_conf)):
+        return None
+    # script name is owned by tesseract
+    return OsdResult(orientation.value, orientation_conf.value,
+                     (script.value or b'').decode('utf-8'),
+                     script_conf.value)
+
+
+def iter_layout_boxes(tesseract, api, ril):
+    """ Run only layout analysis and yield boxes (x, y, w, h) on level ril
+        No text is recognized, so this is much faster than OCR. Image and
+        page segmentation mode must be already set in api.
+    """
+    page_it = tesseract.TessBaseAPIAnalyseLayout(api)
+    if not page_it:
+        return
+    bounding_box = tesseract.TessPageIteratorBoundingBox
+    next_item = tesseract.TessPageIteratorNext
+    left, top, right, bottom = (ctypes.c_int() for _ in range(4))
+    coords = [ctypes.byref(coord) for coord in (left, top, right, bottom)]
+    try:
+        while True:
+            if bounding_box(page_it, ril, *coords):
+                yield (left.value, top.value, right.value - left.value,
+                       bottom.value - top.value)
+            if not next_item(page_it, ril):
+                break
+    finally:
+        tesseract.TessPageIteratorDelete(page_it)
+
+
+def iter_rectangle_results(tesseract, api, boxes, ril, psm=None):
+    """ Recognize each box (x, y, w, h) separately with
+        SetRectangle + GetUTF8Text. Image must be already set in api.
+        Boxes are recognized with psm (default: suitable for ril).
+    """
+    set_rectangle = tesseract.TessBaseAPISetRectangle
+    get_utf8_text = tesseract.TessBaseAPIGetUTF8Text
+    mean_text_conf = tesseract.TessBaseAPIMeanTextConf
+    if psm is None:
+        psm = get_ocr_psm(ril)
+    tesseract.TessBaseAPISetPageSegMode(api, psm)
+    for x, y, w, h in boxes:
+        set_rectangle(api, x, y, w, h)
+        text = get_text(tesseract, get_utf8_text(api))
+        conf = mean_text_conf(api)
+        yield BoxResult(x, y, w, h, conf, text)
+
+
+class Monitor(object):
+    """ Progress monitor (ETEXT_DESC) which can cancel running recognition
+        Cancelling works only with tesseract versions providing
+        TessMonitorCreate (4.0+), otherwise monitor is NULL.
+    """
+
+    def __init__(self, tesseract):
+        self.tesseract = tesseract
+        self.cancelled = False
+        self._as_parameter_ = ctypes.c_void_p()
+        if hasattr(tesseract, 'TessMonitorCreate'):
+            self._as_parameter_ = ctypes.c_void_p(
+                tesseract.TessMonitorCreate())
+            # Keep reference to callback while monitor exists
+            self._cancel_func = bindings.CANCEL_FUNC(self._is_cancelled)
+            tesseract.TessMonitorSetCancelFunc(self, self._cancel_func)
+
+    def _is_cancelled(self, cancel_this, words):
+        return int(self.cancelled)
+
+    def cancel(self):
+        """ Request cancel of recognition
+        """
+        self.cancelled = True
+
+    def close(self):
+        """ Release monitor
+        """
+        if self._as_parameter_.value:
+            self.tesseract.TessMonitorDelete(self)
+            self._as_parameter_ = ctypes.c_void_p()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def iter_page_results(tesseract, api, ril, monitor=None):
+    """ Recognize whole page in single pass and walk result iterator on
+        level ril. Image and page segmentation mode must be already set in
+        api. Optional monitor can cancel recognition.
+    """
+    if tesseract.TessBaseAPIRecognize(api, monitor):
+        print('Recognition failed...')
+        return
+    yield from iter_recognized_results(tesseract, api, ril)
+
+
+def iter_recognized_results(tesseract, api, ril):
+    """ Walk result iterator of page already recognized by
+        TessBaseAPIRecognize on level ril
+    """
+    res_it = tesseract.TessBaseAPIGetIterator(api)
+    if not res_it:
+        return
+    page_it = tesseract.TessResultIteratorGetPageIterator(res_it)
+    bounding_box = tesseract.TessPageIteratorBoundingBox
+    get_utf8_text = tesseract.TessResultIteratorGetUTF8Text
+    confidence = tesseract.TessResultIteratorConfidence
+    next_item = tesseract.TessResultIteratorNext
+    left, top, right, bottom = (ctypes.c_int() for _ in range(4))
+    coords = [ctypes.byref(coord) for coord in (left, top, right, bottom)]
+    try:
+        while True:
+            if bounding_box(page_it, ril, *coords):
+                text = get_text(tesseract, get_utf8_text(res_it, ril))
+                conf = confidence(res_it, ril)
+                yield BoxResult(left.value, top.value,
+                                right.value - left.value,
+                                bottom.value - top.value, int(conf), text)
+            if not next_item(res_it, ril):
+                break
+    finally:
+        tesseract.TessResultIteratorDelete(res_it)
+
+
 def main():
     """Run a simple test
     """
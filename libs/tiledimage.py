@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright © Zdenko Podobný 2014-2017
+# Licensed under the terms of the Apache License Version 2.0
+
+""" Graphics item displaying large PIX as pyramid of tiles
+"""
+
+import math
+from collections import OrderedDict
+
+from PyQt5.QtCore import QRectF
+from PyQt5.QtGui import QPixmap
+from PyQt5.QtWidgets import QGraphicsItem, QStyleOptionGraphicsItem
+
+from libs import lepttool as lept
+from libs import stats
+
+
+class TiledImageItem(QGraphicsItem):
+    """ Image item which converts to pixmaps only tiles visible in viewport
+        Level n of pyramid is PIX downscaled by 2^n, levels are created
+        lazily with leptonica when zoomed out. Converted tiles are kept in
+        LRU cache limited to max_tiles.
+    """
+
+    def __init__(self, pix_image, tile_size=512, max_tiles=64,
+                 parent=None):
+        super(TiledImageItem, self).__init__(parent)
+        self.tile_size = tile_size
+        self.max_tiles = max_tiles
+        self.levels = [pix_image.clone()]
+        self.width = pix_image.width
+        self.height = pix_image.height
+        self.max_level = 0
+        while max(self.width, self.height) >> self.max_level > tile_size:
+            self.max_level += 1
+        self.tiles = OrderedDict()  # (level, column, row) -> QPixmap
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption, True)
+
+    def boundingRect(self):
+        return QRectF(0, 0, self.width, self.height)
+
+    def close(self):
+        """ Release PIX of all levels and cached tiles
+        """
+        for level in self.levels:
+            level.close()
+        self.levels = []
+        self.tiles.clear()
+
+    def get_level(self, level):
+        """ Return Pix of level, create missing levels from previous ones
+        """
+        while len(self.levels) <= level:
+            scaled = self.levels[-1].scale(0.5)
+            if not scaled:
+                return self.levels[-1]
+            self.levels.append(scaled)
+        return self.levels[level]
+
+    def get_tile(self, level, column, row):
+        """ Return pixmap of tile, convert it if it is not in cache
+        """
+        key = (level, column, row)
+        pixmap = self.tiles.get(key)
+        if pixmap is not None:
+            self.tiles.move_to_end(key)
+            return pixmap
+        pix_level = self.get_level(level)
+        size = self.tile_size
+        with lept.Box.create(pix_level.leptonica, column * size, row * size,
+                             size, size) as box:
+            with pix_level.clip(box) as tile:
+                qimage = tile.to_qimage() if tile else None
+        pixmap = QPixmap.fromImage(qimage) if qimage else QPixmap()
+        self.tiles[key] = pixmap
+        while len(self.tiles) > self.max_tiles:
+            self.tiles.popitem(last=False)
+        return pixmap
+
+    def paint(self, painter, option, widget=None):
+        """ Paint visible tiles of level matching current zoom
+        """
+        if not self.levels:
+            return
+        with stats.timed('draw/tiles'):
+            self.paint_tiles(painter, option)
+
+    def paint_tiles(self, painter, option):
+        """ Paint tiles in exposed rectangle
+        """
+        lod = QStyleOptionGraphicsItem.levelOfDetailFromTransform(
+            painter.worldTransform())
+        level = 0
+        if lod < 1:
+            level = min(self.max_level, int(math.log2(1 / lod)))
+        scale = 2 ** level
+        size = self.tile_size
+        exposed = option.exposedRect.intersected(self.boundingRect())
+        first_column = int(exposed.left() / scale) // size
+        last_column = int(exposed.right() / scale) // size
+        first_row = int(exposed.top() / scale) // size
+        last_row = int(exposed.bottom() / scale) // size
+        for row in range(first_row, last_row + 1):
+            for column in range(first_column, last_column + 1):
+                pixmap = self.get_tile(level, column, row)
+                if pixmap.isNull():
+                    continue
+                target = QRectF(column * size * scale, row * size * scale,
+                                pixmap.width() * scale,
+                                pixmap.height() * scale)
+                painter.drawPixmap(target, pixmap,
+                                   QRectF(pixmap.rect()))
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright © Zdenko Podobný 2014-2017
+# Licensed under the terms of the Apache License Version 2.0
+
+""" Streaming output writers
+
+    NativeRenderer uses tesseract result renderers which write every page
+    to output as soon as it is added. JsonLinesWriter writes every result
+    as one JSON object per line as it is produced by result iterator.
+"""
+
+import json
+
+from libs import tesstool as tess
+
+# Output format: (renderer create function, extension added by renderer)
+RENDERERS = {
+    'txt': ('TessTextRendererCreate', '.txt'),
+    'hocr': ('TessHOcrRendererCreate', '.hocr'),
+    'tesstsv': ('TessTsvRendererCreate', '.tsv'),
+    'pdf': ('TessPDFRendererCreate', '.pdf'),
+    'alto': ('TessAltoRendererCreate', '.xml'),
+}
+
+# Output base name used by tesseract renderers for standard output
+STDOUT = 'stdout'
+# Renderers of older versions (3.03) have no outputbase and keep output
+# in memory
+MIN_RENDERER_VERSION = (3, 4)
+
+
+def has_renderer(tesseract, output_format):
+    """ Return True if loaded tesseract provides renderer of output_format
+        writing to file
+    """
+    return (output_format in RENDERERS and
+            tess.version_info() >= MIN_RENDERER_VERSION and
+            hasattr(tesseract, RENDERERS[output_format][0]))
+
+
+class NativeRenderer(object):
+    """ Tesseract TessResultRenderer writing to outputbase + extension
+        (or to standard output if outputbase is STDOUT)
+    """
+
+    def __init__(self, tesseract, output_format, outputbase, datadir=None):
+        self.tesseract = tesseract
+        create = getattr(tesseract, RENDERERS[output_format][0])
+        if output_format == 'pdf':
+            # textonly argument is ignored by tesseract 3.x
+            renderer = create(outputbase.encode(), (datadir or '').encode(),
+                              0)
+        else:
+            renderer = create(outputbase.encode())
+        self._as_parameter_ = renderer
+        self.pages = 0
+
+    def __bool__(self):
+        return bool(self._as_parameter_)
+
+    def begin(self, title):
+        """ Start document, return False on failure
+        """
+        return bool(self.tesseract.TessResultRendererBeginDocument(
+            self, title.encode()))
+
+    def add_page(self, api):
+        """ Recognize image set in api (if it was not done yet) and write it
+            as next page. Return False on failure.
+        """
+        self.pages += 1
+        return bool(self.tesseract.TessResultRendererAddImage(self, api))
+
+    def end(self):
+        """ Finish document, return False on failure
+        """
+        return bool(self.tesseract.TessResultRendererEndDocument(self))
+
+    def close(self):
+        """ Release renderer, output file is closed
+        """
+        if self._as_parameter_:
+            self.tesseract.TessDeleteResultRenderer(self)
+            self._as_parameter_ = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def json_line(result, filename='', page_no=0):
+    """ Return result (tesstool.BoxResult) as line of JSON Lines
+    """
+    record = result._asdict()
+    record['file'] = filename
+    record['page'] = page_no + 1
+    return json.dumps(record, ensure_ascii=False) + '\n'
+
+
+class JsonLinesWriter(object):
+    """ Write results to text stream, one JSON object per line
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.count = 0
+
+    def write_results(self, results, filename='', page_no=0):
+        """ Write results (iterable of tesstool.BoxResult) one by one as
+            they are produced, return number of written results
+        """
+        written = 0
+        for result in results:
+            self.stream.write(json_line(result, filename, page_no))
+            written += 1
+        self.stream.flush()
+        self.count += written
+        return written
+
+
+def format_jsonl(results, filename='', page_no=0):
+    """ Return results as JSON Lines text
+    """
+    return ''.join(json_line(result, filename, page_no)
+                   for result in results)
@@ -16,24 +16,37 @@ __date__ = '21.05.2017'
 
 import os
 import sys
+import time
 import ctypes
-import locale
+from collections import deque
+
+# Start of program taken before PyQt5 and libs are imported, so time to
+# first paint of main window includes their import
+START_TIME = time.perf_counter()
 
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QStyleFactory,
                              QFileDialog, QStyle, QGraphicsScene)
 from PyQt5.QtGui import (QTextCursor, QBrush, QColor, QTransform, QPixmap,
-                         QPen, QIcon)
-from PyQt5.QtCore import (Qt, pyqtSignal, pyqtSlot, QCoreApplication, QEvent,
-                          QRectF)
+                         QIcon)
+from PyQt5.QtCore import (Qt, pyqtSignal, pyqtSlot, QEvent, QTimer)
 
 from ui.ui_mainwindow import Ui_MainWindow
 
 import libs.tesstool as tess
 import libs.lepttool as lept
 import libs.settings as sett
+import libs.resultcache as resultcache
+import libs.preprocess as preprocess
+import libs.stats as stats
+import libs.osdrouter as osdrouter
 
 from libs.scene import CustomGraphicsScene
-from libs.areaitem import AreaItem
+from libs.areaitem import AreaItem, SelectedChange
+from libs.boxoverlay import BoxOverlay
+from libs.tiledimage import TiledImageItem
+from libs.pagesource import PageSource
+from libs.ocrworker import OcrWorker, start_worker
+from libs.startup import StartupWorker
 
 
 class MainWindow(QMainWindow, Ui_MainWindow):
@@ -64,39 +77,53 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.actionZoomToWidth.triggered.connect(self.zoomToWidth)
 
         # Initialize variables and pointers
-        self.box_data = []
-        self.pix_image = False
+        self.overlay = None
+        self.page_source = None
+        self.page_no = 0
+        self.pix_image = None
+        self.ocr_pix = None
+        self.stats_dialog = None
         self.image = None
         self.image_width = 0
         self.image_height = 0
         self.tesseract = None
         self.api = None
+        self.api_cache = None
+        self.ocr_worker = None
+        self.ocr_thread = None
+        self.ocr_key = None
+        self.ocr_results = []
+        self.ocr_indexes = None
+        self.roi_jobs = None  # deque of (cache key, AreaItem) of ROI OCR
+        self.area_results = {}  # AreaItem -> (cache key, result)
+        # Results of boxes recognized separately, valid for known_params
+        self.known_results = {}  # (x, y, w, h) -> BoxResult
+        self.known_params = None
+        self.job_params = None  # params of running box recognition
+        self.in_place = False  # results of job replace shown ones at end
+        self.previous_results = []  # shown results kept if job is cancelled
+        self.api_image = None  # (api, PIX) of image set in api
+        self.image_hash = None
+        self.image_name = None
+        self.leptonica = None
+        self.preprocessor = preprocess.Preprocessor(None)
+        self.startup_thread = None
+        self.router = None
+        self.routed_langs = {}  # (image hash, fallback language) -> lang
+        cache_size = sett.readSetting('result_cache/max_size_mb')
+        self.result_cache = resultcache.ResultCache(
+            max_size=cache_size * 1024 * 1024)
         self.lang = 'eng'
 
         lang = sett.readSetting('language')
         if lang:
             self.lang = lang
 
-        self.initialize_tesseract()
-        if self.tesseract:
-            available_languages = tess.get_list_of_langs(self.tesseract,
-                                                         self.api)
-            if available_languages:
-                for lang in available_languages:
-                    self.comboBoxLang.addItem(lang, lang)
-            current_index = self.comboBoxLang.findData(self.lang)
-            if current_index:
-                self.comboBoxLang.setCurrentIndex(current_index)
-
         for idx, psm in enumerate(tess.PSM):
             self.comboBoxPSM.addItem(psm, idx)
         for idx, ril in enumerate(tess.RIL):
             self.comboBoxRIL.addItem(ril, idx)
 
-        self.leptonica = lept.get_leptonica()
-        if not self.leptonica:
-            self.show_msg('Leptonica initialization failed...')
-
         # Read settings and set default values
         geometry = sett.readSetting('settings_geometry')
         if geometry is not None:
@@ -129,135 +156,630 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         if ril:
             current_index = self.comboBoxRIL.findData(ril)
             self.comboBoxRIL.setCurrentIndex(current_index)
+        self.checkBoxSinglePass.setChecked(sett.readSetting('single_pass'))
+        self.checkBoxSegmentOnly.setChecked(sett.readSetting('segment_only'))
+        self.checkBoxRoute.setChecked(sett.readSetting('osd/route'))
+        self.checkBoxIncremental.setChecked(sett.readSetting('incremental'))
+        self.checkBoxIncremental.setEnabled(self.incremental_available())
+        self.lineEditPreprocess.setText(sett.readSetting('preprocess'))
 
-        image_name = sett.readSetting('images/last_filename')
-        if image_name:
-            self.image_name = image_name
-        self.load_image(image_name)
-        zoom_factor = sett.readSetting('images/zoom_factor')
-        self.setZoom(zoom_factor)
+        self.image_name = sett.readSetting('images/last_filename')
+
+        # Libraries, image and tesseract are loaded after window is shown
+        self.pushButtonShow.setEnabled(False)
+        self.pushButtonLoad.setEnabled(False)
+        QTimer.singleShot(0, self.start_background_init)
+
+    @pyqtSlot()
+    def start_background_init(self):
+        """Report time to first paint and start loading of libraries
+        """
+        elapsed = time.perf_counter() - START_TIME
+        stats.add_time('startup/first_paint', elapsed)
+        self.show_msg('Window shown in %d ms.' % (elapsed * 1000))
+        self.startup_worker = StartupWorker(
+            os.path.dirname(__file__), self.lang, self.image_name,
+            sett.readSetting('api_cache/capacity'),
+            sett.readSetting('api_cache/max_memory_mb') * 1024 * 1024)
+        self.startup_worker.leptonicaReady.connect(self.leptonica_ready)
+        self.startup_worker.imageReady.connect(self.first_image_ready)
+        self.startup_worker.tesseractReady.connect(self.tesseract_ready)
+        self.startup_worker.languagesReady.connect(self.languages_ready)
+        self.startup_worker.finished.connect(self.startup_finished)
+        self.startup_thread = start_worker(self.startup_worker)
 
-    def initialize_tesseract(self):
-        """Create tesseract api
+    @pyqtSlot(object)
+    def leptonica_ready(self, leptonica):
+        """Use loaded leptonica
         """
-        self.tesseract = tess.get_tesseract(os.path.dirname(__file__))
+        self.leptonica = leptonica
+        if not self.leptonica:
+            self.show_msg('Leptonica initialization failed...')
+            return
+        self.preprocessor.leptonica = leptonica
+        self.pushButtonLoad.setEnabled(True)
+
+    @pyqtSlot(object, object)
+    def first_image_ready(self, page_source, pix_image):
+        """Show first page decoded during startup
+        """
+        self.page_source = page_source
+        if len(self.page_source) > 1:
+            self.show_msg('Document has %d pages.' % len(self.page_source))
+        self.show_page(0, pix_image)
+        self.setZoom(sett.readSetting('images/zoom_factor'))
+
+    @pyqtSlot(object, object, object)
+    def tesseract_ready(self, tesseract, api_cache, api):
+        """Use loaded tesseract and api initialized for current language
+        """
+        self.tesseract = tesseract
         if not self.tesseract:
             self.show_msg('Tesseract initialization failed...')
             return
-        self.api = self.tesseract.TessBaseAPICreate()
-        tessdata_prefix = tess.get_tessdata_prefix()
-        # current_locale = locale.getlocale()  # Save current locale
-        # Switch to C locale to handle
-        #  Error: Illegal min or max specification!
-        #  "Fatal error encountered!" == NULL:Error:Assert failed:in file
-        #   ../../tesseract-ocr/ccutil/globaloc.cpp, line 75
-        locale.setlocale(locale.LC_ALL, 'C')
-        retc = self.tesseract.TessBaseAPIInit3(self.api,
-                                               tessdata_prefix.encode(),
-                                               self.lang.encode())
-        # Restore saved locale
-        # locale.setlocale(locale.LC_ALL, current_locale)
-        if (retc):
-            self.tesseract.TessBaseAPIDelete(self.api)
+        self.api_cache = api_cache
+        self.use_api(api)
+        try:
+            script_langs = osdrouter.parse_script_langs(
+                sett.readSetting('osd/script_langs'))
+        except ValueError as error:
+            self.show_msg('%s, default script mapping is used.' % error)
+            script_langs = None
+        self.router = osdrouter.OsdRouter(api_cache, self.lang, script_langs)
+        if not self.api:
             self.show_msg('<span style="color:red">Could not initialize '
                           'tesseract.</span>')
             return
         self.show_msg('Tesseract {0} initialized with language \'{1}\'.\n'
                       '{2} is used with image support for {3}'
                       .format(tess.VERSION, self.lang,
-                              lept.get_version(), lept.get_image_support()))
+                              lept.get_version(self.leptonica),
+                              lept.get_image_support(self.leptonica)))
+        self.pushButtonShow.setEnabled(self.page_source is not None)
+
+    @pyqtSlot(list)
+    def languages_ready(self, languages):
+        """Fill list of available languages
+        """
+        for lang in languages:
+            self.comboBoxLang.addItem(lang, lang)
+        current_index = self.comboBoxLang.findData(self.lang)
+        if current_index >= 0:
+            self.comboBoxLang.setCurrentIndex(current_index)
+
+    @pyqtSlot()
+    def startup_finished(self):
+        """Release startup thread
+        """
+        self.startup_thread.wait()
+        self.startup_thread = None
+        self.startup_worker = None
+        self.show_msg('Startup finished in %d ms.' %
+                      ((time.perf_counter() - START_TIME) * 1000))
+
+    def use_api(self, api):
+        """Make api current, it is pinned in api cache, so routing or
+           other language does not end it while it is used
+        """
+        if api:
+            self.api_cache.pin(api)
+        if self.api:
+            self.api_cache.release(self.api)
+        self.api = api
+
+    def format_cache_stats(self):
+        """Return api cache statistics as text
+        """
+        cache_stats = self.api_cache.stats()
+        return ('%(hits)d hits, %(misses)d misses, %(evictions)d evictions, '
+                '%(size)d apis' % cache_stats)
 
     @pyqtSlot()
     def on_pushButtonShow_pressed(self):
-        """Display rectangles
-        """
-        tessdata_prefix = tess.get_tessdata_prefix()
-        locale.setlocale(locale.LC_ALL, 'C')
-        retc = 0
-        if self.lang != str(self.comboBoxLang.currentText()):
-            self.lang = str(self.comboBoxLang.currentText())
-            retc = self.tesseract.TessBaseAPIInit3(self.api,
-                                                   tessdata_prefix,
-                                                   self.lang)
-            self.show_msg('Using language \'%s\'.' % self.lang)
-        if (retc):
-            self.tesseract.TessBaseAPIDelete(self.api)
-            self.show_msg('<span style="color:red">Could not re-initialize '
-                          'tesseract.</span>')
+        """Start OCR job or cancel running one
+        """
+        if self.ocr_worker is not None:
+            self.show_msg('Cancelling...')
+            self.ocr_worker.cancel()
+            return
+        lang = str(self.comboBoxLang.currentText())
+        route = self.checkBoxRoute.isChecked()
+        psm_idx = self.comboBoxPSM.currentIndex()
+        ril_idx = self.comboBoxRIL.currentIndex()
+        single_pass = self.checkBoxSinglePass.isChecked()
+        segment_only = self.checkBoxSegmentOnly.isChecked()
+        layout_dpi = sett.readSetting('layout_dpi')
+        if segment_only:
+            mode = 'layout'
+        else:
+            mode = 'page' if single_pass else 'rectangles'
+        if self.image_hash is None:
+            with stats.timed('show/digest'):
+                self.image_hash = self.pix_image.digest()
+        # preprocessed image is memoized and it is shown with results
+        with stats.timed('show/preprocess'):
+            if not self.prepare_ocr_image():
+                return
+        variables = {'preprocess': preprocess.format_steps(
+            self.preprocessor.steps if self.ocr_pix else [])}
+        if mode == 'rectangles':
+            variables['layout_dpi'] = layout_dpi
+        if route:
+            variables['route'] = True
+        # key uses selected language (fallback of routing), so cached
+        # results are found before any api is initialized or page routed
+        self.ocr_key = resultcache.make_key(
+            self.image_hash, None, lang, psm_idx, ril_idx, mode, variables)
+        cached = self.result_cache.get(self.ocr_key)
+        if cached is not None:
+            self.show_msg('Using cached OCR results.')
+            result_lang = lang
+            if route:
+                result_lang = self.routed_langs.get((self.image_hash, lang))
+            self.job_params = None
+            if mode in ('rectangles', 'layout') and result_lang:
+                self.job_params = self.recognition_params(ril_idx,
+                                                          result_lang)
+            self.clear_boxes()
+            self.add_results(cached)
+            self.remember_results(cached)
+            self.report_ocr(len(cached), False)
             return
 
+        if self.lang != lang:
+            with stats.timed('show/init'):
+                api = self.api_cache.get(lang)
+            if not api:
+                self.show_msg('<span style="color:red">Could not '
+                              'initialize tesseract with language \'%s\'.'
+                              '</span>' % lang)
+                return
+            self.use_api(api)
+            self.lang = lang
+            self.show_msg('Using language \'%s\' (api cache: %s).' %
+                          (self.lang, self.format_cache_stats()))
+        if route and not self.route_page(lang):
+            return
+        known = None
+        self.job_params = None
+        if mode in ('rectangles', 'layout'):
+            self.job_params = self.recognition_params(ril_idx)
+            known = self.get_known_results(self.job_params)
+        # boxes with known results are not recognized again, shown boxes
+        # are updated in place when job is finished
+        self.in_place = bool(known)
+        if self.in_place:
+            self.previous_results = self.ocr_results
+            self.ocr_results = []
+        else:
+            self.clear_boxes()
+
         # Shut up tesseract - there could be a lot of unwanted messages
         #tesseract.TessBaseAPISetVariable(api, "debug_file", "/dev/null")
 
+        with stats.timed('show/set_image'):
+            self.set_api_image(force=True)
+            self.tesseract.TessBaseAPISetPageSegMode(self.api, psm_idx)
+
+        self.ocr_indexes = None
+        self.start_ocr(OcrWorker(self.tesseract, self.leptonica, self.api,
+                                 ril_idx, single_pass, segment_only,
+                                 pix_image=self.get_ocr_image(),
+                                 layout_dpi=layout_dpi, known=known))
+
+    def recognition_params(self, ril, lang=None):
+        """Return parameters influencing recognition of single box
+           (lang defaults to language of current api)
+        """
+        return (self.image_hash, lang or self.lang,
+                tess.get_ocr_psm(ril).value,
+                preprocess.format_steps(
+                    self.preprocessor.steps if self.ocr_pix else []))
+
+    def get_known_results(self, params):
+        """Return results of boxes recognized with params, results
+           recognized with other parameters are forgotten
+        """
+        if params != self.known_params:
+            self.known_results = {}
+            self.known_params = params
+        return self.known_results
+
+    def remember_results(self, results):
+        """Store results of job for reuse by next job with the same
+           parameters
+        """
+        if self.job_params is None:
+            return
+        known = self.get_known_results(self.job_params)
+        for result in results:
+            if result.conf >= 0:
+                known[tuple(result[:4])] = result
+
+    def incremental_available(self):
+        """Return True if known results can be reused, i.e. boxes are
+           recognized separately or only layout is analysed
+        """
+        return (self.checkBoxSegmentOnly.isChecked() or
+                not self.checkBoxSinglePass.isChecked())
+
+    def update_on_change(self):
+        """Repeat OCR after change of parameters if it is enabled
+        """
+        if (self.checkBoxIncremental.isChecked() and
+                self.incremental_available() and self.ocr_results and
+                self.ocr_worker is None and self.api):
+            self.on_pushButtonShow_pressed()
+
+    @pyqtSlot(bool)
+    def on_checkBoxSinglePass_toggled(self, checked):
+        """Enable update on change only if results can be reused
+        """
+        self.checkBoxIncremental.setEnabled(self.incremental_available())
+
+    @pyqtSlot(bool)
+    def on_checkBoxSegmentOnly_toggled(self, checked):
+        """Enable update on change only if results can be reused
+        """
+        self.checkBoxIncremental.setEnabled(self.incremental_available())
+
+    @pyqtSlot(int)
+    def on_comboBoxPSM_currentIndexChanged(self, index):
+        """Repeat OCR with new page segmentation mode if it is enabled
+        """
+        self.update_on_change()
+
+    @pyqtSlot(int)
+    def on_comboBoxRIL_currentIndexChanged(self, index):
+        """Repeat OCR with new iterator level if it is enabled
+        """
+        self.update_on_change()
+
+    def route_page(self, fallback_lang):
+        """Switch api to language of script detected on current page
+           Return False if api for it could not be initialized.
+        """
+        if not self.router.is_available():
+            self.show_msg('Script detection is not available (tesseract '
+                          '%s or missing osd.traineddata).' % tess.VERSION)
+            return True
+        key = (self.image_hash, fallback_lang)
+        self.router.fallback_lang = fallback_lang
+        if key in self.routed_langs:
+            lang = self.routed_langs[key]
+            api = self.api_cache.get(lang)
+        else:
+            with stats.timed('show/route'):
+                lang, api, osd = self.router.route(self.pix_image)
+            if osd is None:
+                self.show_msg('Script was not detected, using \'%s\'.' %
+                              lang)
+            else:
+                self.show_msg('Detected script %s (%.2f), orientation %d '
+                              '(%.2f), using \'%s\'.' %
+                              (osd.script, osd.script_conf, osd.orientation,
+                               osd.orientation_conf, lang))
+        if not api:
+            self.show_msg('<span style="color:red">Could not initialize '
+                          'tesseract with language \'%s\'.</span>' % lang)
+            return False
+        self.routed_langs[key] = lang
+        self.use_api(api)
+        self.lang = lang
+        return True
+
+    def get_ocr_image(self):
+        """Return preprocessed PIX or original one if there is no
+           preprocessing
+        """
+        return self.ocr_pix if self.ocr_pix is not None else self.pix_image
+
+    def prepare_ocr_image(self):
+        """Run preprocessing chain and show its result in scene
+           Return False if preprocessing failed.
+        """
+        processed_shown = self.ocr_pix is not None
+        self.close_ocr_image()
+        text = self.lineEditPreprocess.text().strip()
+        if not text:
+            if processed_shown:
+                self.set_scene_image()
+            return True
+        try:
+            self.preprocessor.steps = preprocess.parse_steps(text)
+        except ValueError as error:
+            self.show_msg('<span style="color:red">%s</span>' % error)
+            return False
+        computed = self.preprocessor.computed
+        self.ocr_pix = self.preprocessor.run(self.pix_image,
+                                             self.image_hash)
+        if self.ocr_pix is None:
+            self.show_msg('<span style="color:red">Preprocessing '
+                          'failed.</span>')
+            return False
+        self.set_scene_image(pix_image=self.ocr_pix)
+        self.show_msg('Preprocessed with %s (%d of %d steps computed).' %
+                      (preprocess.format_steps(self.preprocessor.steps),
+                       self.preprocessor.computed - computed,
+                       len(self.preprocessor.steps)))
+        return True
+
+    def set_api_image(self, force=False):
+        """Set OCR image to api unless it is already set there (or force
+           is True). Previous results are cleared with the image.
+        """
+        image = self.get_ocr_image()
+        key = (self.api.value, image.pointer)
+        if not force and self.api_image == key:
+            return
         self.tesseract.TessBaseAPIClear(self.api)
         # Set PIX structure to tesseract api
-        self.tesseract.TessBaseAPISetImage2(self.api, self.pix_image)
+        self.tesseract.TessBaseAPISetImage2(self.api, image)
+        self.api_image = key
 
-        self.tesseract.TessBaseAPISetPageSegMode(
-            self.api, self.comboBoxPSM.currentIndex())
+    def close_ocr_image(self):
+        """Release preprocessed PIX
+        """
+        # shown image is replaced, so api has to get new one
+        self.api_image = None
+        if self.ocr_pix is not None:
+            self.ocr_pix.close()
+            self.ocr_pix = None
 
-        # Get info(BOXA structure) about lines(RIL_TEXTLINE) from image in api
-        boxa = self.tesseract.TessBaseAPIGetComponentImages(
-            self.api, self.comboBoxRIL.currentIndex(), 1, None, None)
-        if not boxa:
-            self.show_msg('No component found. Try to change PSM or RIL.')
+    def recognize_boxes(self, indexes):
+        """Recognize text of boxes found by layout analysis
+        """
+        if self.ocr_worker is not None or not indexes:
             return
+        boxes = [tuple(self.ocr_results[idx][:4]) for idx in indexes]
+        self.set_api_image()
+        self.ocr_indexes = deque(indexes)
+        self.job_params = self.recognition_params(
+            self.comboBoxRIL.currentIndex())
+        self.show_msg('Recognizing %d boxes...' % len(indexes))
+        self.start_ocr(OcrWorker(self.tesseract, self.leptonica, self.api,
+                                 self.comboBoxRIL.currentIndex(), False,
+                                 boxes=boxes))
+
+    def get_area_rects(self):
+        """Return list of (AreaItem, (x, y, w, h)) of all areas in scene
+           clipped to image, areas outside of image are skipped
+        """
+        rects = []
+        for item in self.scene.items():
+            if not isinstance(item, AreaItem):
+                continue
+            rect = item.sceneRect()
+            left = max(0, int(rect.left()))
+            top = max(0, int(rect.top()))
+            right = min(self.image_width, int(rect.right() + 0.5))
+            bottom = min(self.image_height, int(rect.bottom() + 0.5))
+            if right > left and bottom > top:
+                rects.append((item, (left, top, right - left, bottom - top)))
+        # keep reading order of areas
+        rects.sort(key=lambda area: (area[1][1], area[1][0]))
+        return rects
+
+    def recognize_areas(self):
+        """Recognize text of all areas in shown image without cropping
+           Image is set to api only once and every area is recognized with
+           SetRectangle. Results are cached per area.
+        """
+        if self.ocr_worker is not None or not self.api:
+            return
+        areas = self.get_area_rects()
+        if not areas:
+            self.show_msg('There is no area inside of image.')
+            return
+        if self.image_hash is None:
+            with stats.timed('show/digest'):
+                self.image_hash = self.pix_image.digest()
+        psm = tess.PSM_SINGLE_BLOCK
+        ril = self.comboBoxRIL.currentIndex()
+        variables = {'preprocess': preprocess.format_steps(
+            self.preprocessor.steps if self.ocr_pix else [])}
+        self.area_results = {item: known for item, known
+                             in self.area_results.items()
+                             if item.scene() is self.scene}
+        jobs = deque()
+        unchanged = 0
+        for item, rect in areas:
+            key = resultcache.make_key(self.image_hash, rect, self.lang,
+                                       psm.value, ril, 'roi', variables)
+            if self.area_results.get(item, (None,))[0] == key:
+                unchanged += 1
+                continue
+            cached = self.result_cache.get(key)
+            if cached:
+                self.show_area_result(item, key, cached[0])
+            else:
+                jobs.append((key, item, rect))
+        self.show_msg('%d of %d areas are unchanged, %d cached.' %
+                      (unchanged, len(areas),
+                       len(areas) - unchanged - len(jobs)))
+        if not jobs:
+            return
+        with stats.timed('show/set_image'):
+            self.set_api_image()
+        self.roi_jobs = deque((key, item) for key, item, _ in jobs)
+        self.start_ocr(OcrWorker(self.tesseract, self.leptonica, self.api,
+                                 ril, False,
+                                 boxes=[rect for _, _, rect in jobs],
+                                 psm=psm))
+
+    def show_area_result(self, item, key, result):
+        """Show text recognized in area
+        """
+        self.area_results[item] = (key, result)
+        item.setToolTip(result.text)
+        self.show_msg('Area x=%d, y=%d, w=%d, h=%d, confidence: %d, '
+                      'text: <span style="color:blue">%s</span>' %
+                      (result.x, result.y, result.w, result.h, result.conf,
+                       result.text))
+
+    @pyqtSlot()
+    def on_actionRecognizeAreas_triggered(self):
+        """Recognize text of all areas
+        """
+        self.recognize_areas()
+
+    @pyqtSlot(int)
+    def on_box_clicked(self, idx):
+        """Recognize clicked box if it has no text yet
+        """
+        # shown boxes are replaced by running job
+        if idx >= len(self.ocr_results):
+            return
+        if self.ocr_results[idx].conf < 0:
+            self.recognize_boxes([idx])
+
+    def start_ocr(self, worker):
+        """Run OCR worker in background thread
+        """
+        self.ocr_worker = worker
+        # job keeps its api even if current api is changed
+        self.api_cache.pin(worker.api)
+        self.ocr_worker.message.connect(self.show_msg)
+        self.ocr_worker.resultsReady.connect(self.add_results)
+        self.ocr_worker.finished.connect(self.ocr_finished)
+        self.ocr_thread = start_worker(self.ocr_worker)
+        self.set_ocr_running(True)
+
+    def set_ocr_running(self, running):
+        """Switch controls between running and idle OCR job
+        """
+        self.pushButtonShow.setText('Cancel' if running else 'Analyze')
+        self.comboBoxLang.setEnabled(not running)
+        self.actionCrop.setEnabled(not running)
+        self.actionRecognizeAreas.setEnabled(not running)
+        self.pushButtonLoad.setEnabled(not running)
+        self.actionPreviousPage.setEnabled(not running and self.page_no > 0)
+        self.actionNextPage.setEnabled(
+            not running and self.page_no + 1 < len(self.page_source))
+
+    def clear_boxes(self):
+        """Remove boxes of previous OCR job from scene
+        """
+        self.overlay.clear()
+        self.ocr_results = []
+
+    @pyqtSlot(list)
+    def add_results(self, results):
+        """Display batch of OCR results and print its info
+        """
+        if self.ocr_indexes is not None:
+            self.update_results(results)
+            return
+        if self.roi_jobs is not None:
+            for result in results:
+                key, item = self.roi_jobs.popleft()
+                self.result_cache.put(key, self.image_hash, [result])
+                self.show_area_result(item, key, result)
+            return
+        if self.in_place:
+            self.add_results_in_place(results)
+            return
+        first = len(self.overlay)
+        messages = []
+        for item, result in enumerate(results, first):
+            messages.append('Box[%d]: x=%d, y=%d, w=%d, h=%d, '
+                            'confidence: %d, '
+                            'text: <span style="color:blue">%s</span>' %
+                            (item, result.x, result.y, result.w, result.h,
+                             result.conf, result.text))
+        self.ocr_results.extend(results)
+        with stats.timed('show/add_boxes'):
+            self.overlay.add_results(results)
+        with stats.timed('show/log'):
+            self.show_msg('<br>'.join(messages))
+
+    def add_results_in_place(self, results):
+        """Collect batch of results replacing shown ones, only newly
+           recognized boxes are printed
+        """
+        first = len(self.ocr_results)
+        self.ocr_results.extend(results)
+        messages = []
+        for item, result in enumerate(results, first):
+            if self.known_results.get(tuple(result[:4])) is result:
+                continue
+            messages.append('Box[%d]: x=%d, y=%d, w=%d, h=%d, '
+                            'confidence: %d, '
+                            'text: <span style="color:blue">%s</span>' %
+                            (item, result.x, result.y, result.w, result.h,
+                             result.conf, result.text))
+        if messages:
+            self.show_msg('<br>'.join(messages))
+
+    def update_results(self, results):
+        """Replace results of boxes recognized after layout analysis
+        """
+        messages = []
+        for result in results:
+            idx = self.ocr_indexes.popleft()
+            self.ocr_results[idx] = result
+            self.overlay.set_result(idx, result)
+            messages.append('Box[%d]: confidence: %d, '
+                            'text: <span style="color:blue">%s</span>' %
+                            (idx, result.conf, result.text))
+        self.show_msg('<br>'.join(messages))
+
+    @pyqtSlot(int, bool)
+    def ocr_finished(self, count, cancelled):
+        """Clean up after OCR job and store its results to cache
+        """
+        # results recognized before cancel are valid for reuse
+        self.remember_results(self.ocr_results)
+        if self.in_place:
+            if cancelled:
+                # shown boxes stay unchanged
+                self.ocr_results = self.previous_results
+            else:
+                with stats.timed('show/add_boxes'):
+                    self.overlay.replace_results(self.ocr_results)
+            self.previous_results = []
+        if self.ocr_indexes is not None:
+            # Recognized boxes are valid even if job was cancelled
+            self.result_cache.put(self.ocr_key, self.image_hash,
+                                  self.ocr_results)
+            self.show_msg('Recognized %d boxes.' % count)
+        elif self.roi_jobs is not None:
+            self.show_msg('Recognized %d areas.' % count)
+        else:
+            if not cancelled:
+                self.result_cache.put(self.ocr_key, self.image_hash,
+                                      self.ocr_results)
+            if self.ocr_worker.reused:
+                self.show_msg('Reused %d of %d box results.' %
+                              (self.ocr_worker.reused, count))
+            self.report_ocr(count, cancelled)
+        self.ocr_indexes = None
+        self.roi_jobs = None
+        self.job_params = None
+        self.in_place = False
+        self.ocr_thread.wait()
+        self.api_cache.release(self.ocr_worker.api)
+        self.ocr_worker = None
+        self.ocr_thread = None
+        self.set_ocr_running(False)
 
-        # Get info about number of items on image
-        n_items = self.leptonica.boxaGetCount(boxa)
+    def report_ocr(self, count, cancelled):
+        """Show summary of OCR job
+        """
         psm = tess.PSM[self.comboBoxPSM.currentIndex()]
         ril = tess.RIL[self.comboBoxRIL.currentIndex()]
-        self.show_msg('<span style="color:green">'
-                      'Found %d image components with %s and %s.</span>' %
-                      (n_items, psm, ril))
-
-        ocr_psm = tess.PSM_SINGLE_BLOCK
-        if ril == 'RIL_PARA':
-            ocr_psm = tess.PSM_SINGLE_BLOCK
-        elif ril == 'RIL_TEXTLINE':
-            ocr_psm = tess.PSM_SINGLE_LINE
-        elif ril == 'RIL_WORD':
-            ocr_psm = tess.PSM_SINGLE_WORD
-        elif ril == 'RIL_SYMBOL':
-            ocr_psm = tess.PSM_SINGLE_CHAR
-        self.tesseract.TessBaseAPISetPageSegMode(self.api, ocr_psm)
-
-        # Set up result type (BOX structure) for leptonica function boxaGetBox
-        self.leptonica.boxaGetBox.restype = lept.BOX_PTR_T
-        self.leptonica.boxaGetBox.argtypes = []
-        n_boxes = len(self.box_data)
-        if n_boxes:
-            for idx in range(n_boxes):
-                self.scene.removeItem(self.box_data[idx])
-
-        # Display items and print its info
-        box_items = []
-        for item in range(0, n_items):
-            lept_box = self.leptonica.boxaGetBox(boxa, item, lept.L_CLONE)
-            box = lept_box.contents
-            self.tesseract.TessBaseAPISetRectangle(self.api,
-                                                   box.x, box.y, box.w, box.h)
-            ocr_result = self.tesseract.TessBaseAPIGetUTF8Text(self.api)
-            result_text = ctypes.string_at(ocr_result).decode('utf-8').strip()
-            conf = self.tesseract.TessBaseAPIMeanTextConf(self.api)
-            self.show_msg('Box[%d]: x=%d, y=%d, w=%d, h=%d, '
-                          'confidence: %d, '
-                          'text: <span style="color:blue">%s</span>' %
-                          (item, box.x, box.y, box.w, box.h,
-                           conf, result_text
-                           ))
-            box_items.append(
-                self.scene.addRect(
-                    box.x, box.y, box.w, box.h, QPen(
-                        QColor(
-                            255, 0, 0, 255)), QBrush(
-                        QColor(
-                            255, 0, 0, 100))))
-            box_items[item].setAcceptHoverEvents(True)
-            box_items[item].setToolTip("Box[%d]: confidence:%s, text:%s" %
-                                       (item, conf, result_text))
-        QCoreApplication.processEvents()
-        self.box_data = box_items
+        if cancelled:
+            self.show_msg('<span style="color:red">OCR was cancelled after '
+                          '%d components.</span>' % count)
+        elif not count:
+            self.show_msg('No component found. Try to change PSM or RIL.')
+        else:
+            action = 'Recognized'
+            if self.checkBoxSegmentOnly.isChecked():
+                action = 'Found'
+            self.show_msg('<span style="color:green">'
+                          '%s %d components with %s and %s.'
+                          '</span>' % (action, count, psm, ril))
 
     @pyqtSlot()
     def on_pushButtonLoad_pressed(self):
@@ -296,15 +818,38 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.area = AreaItem(0, 0, 300, 150)
         self.area.areaColor = QColor(0, 155, 0, 75)
         self.area.selectedChange.connect(self.areaItemChanges)
+        # Keep area above overlay with OCR boxes
+        self.area.setZValue(self.overlay.zValue() + 1)
         self.scene.addItem(self.area)
 
     @pyqtSlot('QString')
     def areaItemChanges(self, itemAction):
+        # there can be more areas, act on the one which emitted signal
+        sender = self.sender()
+        if isinstance(sender, SelectedChange) and sender.area is not None:
+            self.area = sender.area
         if itemAction == 'removeArea':
             self.show_msg("Removing area")
             self.removeSceneItem()
         elif itemAction == 'crop2Area':
             self.crop2Area()
+        elif itemAction == 'recognizeAreas':
+            self.recognize_areas()
+        elif itemAction == 'areaChanged':
+            if self.checkBoxIncremental.isChecked() and self.area_results:
+                self.recognize_areas()
+        elif itemAction == 'recognizeArea':
+            if self.ocr_running():
+                return
+            boxes = self.overlay.boxes_in(self.area.sceneRect())
+            indexes = [idx for idx in boxes if self.ocr_results[idx].conf < 0]
+            if not boxes:
+                self.show_msg('There is no box in area, run layout analysis '
+                              'first.')
+            elif not indexes:
+                self.show_msg('All %d boxes in area are already recognized.'
+                              % len(boxes))
+            self.recognize_boxes(indexes)
 
     def removeSceneItem(self):
         """
@@ -320,62 +865,155 @@ class MainWindow(QMainWindow, Ui_MainWindow):
     def crop2Area(self):
         """Perform crop action on Area item
         """
+        if self.ocr_running():
+            return
         xb = int(self.area.pos().x())
         yb = int(self.area.pos().y())
         wb = int(self.area.rect().width())
         hb = int(self.area.rect().height())
         self.show_msg("Cropping area: {}, {}, {}, {}".format(xb, yb, wb, hb))
-        box = self.leptonica.boxCreate(xb, yb, wb, hb)
-        cropped = self.leptonica.pixClipRectangle(self.pix_image, box, None)
-        qimage = lept.pix_to_qimage(self.leptonica, cropped)
-        pixmap = QPixmap(qimage)
-        if pixmap:
-            self.scene.removeItem(self.image)
-            del self.image
-            self.image = self.scene.addPixmap(pixmap)
-            self.scene.setSceneRect(QRectF(pixmap.rect()))
-            self.pix_image = cropped
-            self.image_width = self.leptonica.pixGetWidth(self.pix_image)
-            self.image_height = self.leptonica.pixGetHeight(self.pix_image)
-            self.removeSceneItem()
-            self.show_msg("New image size: %dx%d, resolution %dx%d" %
-                          (self.image_width,
-                           self.image_height,
-                           self.leptonica.pixGetXRes(self.pix_image),
-                           self.leptonica.pixGetYRes(self.pix_image)
-                           ))
+        with lept.Box.create(self.leptonica, xb, yb, wb, hb) as box:
+            cropped = self.pix_image.clip(box)
+        if not cropped:
+            self.show_msg('Cropping failed.')
+            return
+        self.pix_image.close()
+        self.pix_image = cropped
+        self.image_hash = None
+        self.close_ocr_image()
+        self.set_scene_image()
+        self.image_width = self.pix_image.width
+        self.image_height = self.pix_image.height
+        self.removeSceneItem()
+        self.clear_boxes()
+        self.show_msg("New image size: %dx%d, resolution %dx%d" %
+                      (self.image_width,
+                       self.image_height,
+                       self.pix_image.xres,
+                       self.pix_image.yres
+                       ))
+
+    def remove_scene_image(self):
+        """Remove image item from scene and release its tiles
+        """
+        if self.image is None:
+            return
+        self.scene.removeItem(self.image)
+        if isinstance(self.image, TiledImageItem):
+            self.image.close()
+        self.image = None
+
+    def set_scene_image(self, filename=None, pix_image=None):
+        """Replace image item in scene with tiles of pix_image (current PIX
+           by default). Image filename is loaded by Qt if PIX is not
+           available
+        """
+        self.remove_scene_image()
+        if pix_image is None:
+            pix_image = self.pix_image
+        if pix_image:
+            self.image = TiledImageItem(pix_image)
+            self.scene.addItem(self.image)
+        elif filename:  # fallback solution
+            self.image = self.scene.addPixmap(QPixmap(filename))
+        if self.image is not None:
+            self.scene.setSceneRect(self.image.boundingRect())
 
     @pyqtSlot('QString')
     def load_image(self, filename):
-        """Load image to scene and create PIX
+        """Open image file and show its first page
         """
+        if self.ocr_running():
+            return
         self.image_name = filename
+        if self.page_source is not None:
+            self.page_source.close()
+        self.page_source = PageSource(self.leptonica, self.image_name)
+        if len(self.page_source) > 1:
+            self.show_msg('Document has %d pages.' % len(self.page_source))
+        self.show_page(0)
+        self.pushButtonShow.setEnabled(bool(self.api))
+
+    def show_page(self, page_no, pix_image=None):
+        """Load page of current document to scene and create PIX
+           Already decoded pix_image of page can be passed.
+        """
+        self.page_no = page_no
+        self.remove_scene_image()
         self.scene.clear()
+        self.area_results = {}
         self.zoomTo1()
-        # Read image with leptonica => create PIX structure and report image
+        # Read page with leptonica => create PIX structure and report image
         # size info
-        self.pix_image = self.leptonica.pixRead(self.image_name.encode())
-        self.image_width = self.leptonica.pixGetWidth(self.pix_image)
-        self.image_height = self.leptonica.pixGetHeight(self.pix_image)
+        if self.pix_image:
+            self.pix_image.close()
+        if pix_image is not None:
+            self.pix_image = pix_image
+        elif len(self.page_source):
+            self.pix_image = self.page_source[page_no]
+        else:
+            self.pix_image = lept.Pix(self.leptonica, None)
+        self.image_hash = None
+        self.close_ocr_image()
+        # Decode next page in background while user works with this one
+        self.page_source.prefetch(page_no + 1)
+        self.image_width = self.pix_image.width
+        self.image_height = self.pix_image.height
         self.show_msg("image size: %dx%d, resolution %dx%d" %
                       (self.image_width,
                        self.image_height,
-                       self.leptonica.pixGetXRes(self.pix_image),
-                       self.leptonica.pixGetYRes(self.pix_image)
+                       self.pix_image.xres,
+                       self.pix_image.yres
                        ))
-        self.box_data = []
-        qimage = lept.pix_to_qimage(self.leptonica, self.pix_image)
-        if not qimage:  # fallback solution
-            pixmap = QPixmap(filename)
-        else:
-            pixmap = QPixmap(qimage)
-        self.image = self.scene.addPixmap(pixmap)
-        self.scene.setSceneRect(QRectF(pixmap.rect()))
+        self.overlay = BoxOverlay()
+        self.overlay.boxClicked.connect(self.on_box_clicked)
+        self.ocr_results = []
+        self.scene.addItem(self.overlay)
+        self.set_scene_image(self.image_name)
+        self.actionPreviousPage.setEnabled(page_no > 0)
+        self.actionNextPage.setEnabled(page_no + 1 < len(self.page_source))
+        page_info = ''
+        if len(self.page_source) > 1:
+            page_info = ' [%d/%d]' % (page_no + 1, len(self.page_source))
         self.setWindowTitle(
             'Analyze & ORC image with tesseract and '
-            'leptonica :: %s' %
-            os.path.basename(
-                self.image_name))
+            'leptonica :: %s%s' %
+            (os.path.basename(
+                self.image_name), page_info))
+
+    @pyqtSlot()
+    def on_actionPreviousPage_triggered(self):
+        """Show previous page of document
+        """
+        if self.page_no > 0 and not self.ocr_running():
+            self.show_page(self.page_no - 1)
+
+    @pyqtSlot()
+    def on_actionNextPage_triggered(self):
+        """Show next page of document
+        """
+        if (self.page_no + 1 < len(self.page_source) and
+                not self.ocr_running()):
+            self.show_page(self.page_no + 1)
+
+    @pyqtSlot()
+    def on_actionStatistics_triggered(self):
+        """Show panel with timing and counters
+        """
+        if self.stats_dialog is None:
+            from libs.statsdialog import StatsDialog
+            self.stats_dialog = StatsDialog(self)
+        self.stats_dialog.show()
+        self.stats_dialog.raise_()
+
+    def ocr_running(self):
+        """Return True (and show message) if OCR job uses current image
+        """
+        if self.ocr_worker is None:
+            return False
+        self.show_msg('Wait until running OCR job is finished or cancel '
+                      'it.')
+        return True
 
     def show_msg(self, message):
         """Show message in textBrowser
@@ -385,11 +1023,15 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         cursor = QTextCursor(self.textEdit.textCursor())
         cursor.movePosition(QTextCursor.End)
         self.textEdit.setTextCursor(cursor)
-        QApplication.processEvents()
 
     def closeEvent(self, event):
         """Store setting on exit
         """
+        if self.ocr_worker is not None:
+            self.ocr_worker.cancel()
+            self.ocr_thread.wait()
+        if self.startup_thread is not None:
+            self.startup_thread.wait()
         sett.storeSetting('geometry', self.saveGeometry())
         sett.storeSetting('state', self.saveState())
         sett.storeSetting("splitter_1Sizes", self.splitter_1.saveState())
@@ -405,8 +1047,22 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         sett.storeSetting('PSM', self.comboBoxPSM.itemData(row_p))
         row_r = self.comboBoxRIL.currentIndex()
         sett.storeSetting('RIL', self.comboBoxRIL.itemData(row_r))
-        if self.api:
-            self.tesseract.TessBaseAPIEnd(self.api)
+        sett.storeSetting('single_pass', self.checkBoxSinglePass.isChecked())
+        sett.storeSetting('segment_only',
+                          self.checkBoxSegmentOnly.isChecked())
+        sett.storeSetting('preprocess', self.lineEditPreprocess.text())
+        sett.storeSetting('osd/route', self.checkBoxRoute.isChecked())
+        sett.storeSetting('incremental', self.checkBoxIncremental.isChecked())
+        if self.api_cache:
+            self.api_cache.clear()
+            self.api = None
+        if self.pix_image:
+            self.pix_image.close()
+        if self.page_source is not None:
+            self.page_source.close()
+        self.close_ocr_image()
+        self.preprocessor.close()
+        self.result_cache.close()
         QMainWindow.closeEvent(self, event)
 
     def setZoom(self, scale):
@@ -494,6 +1150,7 @@ def main():
         myappid = 'tesseract.python.demo.{}'.format(__version__)  # arbitrary string
         ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID(myappid)
     app.setWindowIcon(QIcon(':/images/appIcon'))
+    stats.enable(sett.readSetting('stats/enabled'))
     window = MainWindow()
     window.show()
     app.exec_()
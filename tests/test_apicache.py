@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright © Zdenko Podobný 2014-2017
+# Licensed under the terms of the Apache License Version 2.0
+
+""" Tests of eviction of cached apis
+"""
+
+import ctypes
+import unittest
+from unittest import mock
+
+from libs.apicache import APICache
+
+
+class FakeTesseract(object):
+    """ Records ended apis
+    """
+
+    def __init__(self):
+        self.ended = []
+
+    def TessBaseAPIEnd(self, api):
+        self.ended.append(api.value)
+
+    def TessBaseAPIDelete(self, api):
+        pass
+
+
+def create_api(tesseract, lang, tessdata_prefix=None, oem=None):
+    return ctypes.c_void_p(0x1000 + len(lang))
+
+
+class APICacheTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch('libs.tesstool.create_api', create_api)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.tesseract = FakeTesseract()
+        self.cache = APICache(self.tesseract, capacity=1)
+
+    def test_lru_eviction(self):
+        first = self.cache.get('eng', '/tessdata')
+        self.cache.get('deu+eng', '/tessdata')
+        self.assertEqual(self.tesseract.ended, [first.value])
+
+    def test_pinned_api_is_kept(self):
+        first = self.cache.get('eng', '/tessdata')
+        self.cache.pin(first)
+        second = self.cache.get('deu+eng', '/tessdata')
+        self.cache.get('osd', '/tessdata')
+        self.assertEqual(self.tesseract.ended, [second.value])
+        self.cache.release(first)
+        self.assertEqual(self.tesseract.ended, [second.value, first.value])
+
+
+if __name__ == '__main__':
+    unittest.main()
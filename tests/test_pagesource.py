@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright © Zdenko Podobný 2014-2017
+# Licensed under the terms of the Apache License Version 2.0
+
+""" Tests of lazy page decoding
+"""
+
+import threading
+import unittest
+
+from libs.pagesource import PageSource
+
+
+class FakeLeptonica(object):
+    """ Leptonica functions used by PageSource for 5 page TIFF, every
+        decoded page gets new address and is recorded in reads. Pages read
+        by number (walking directory chain) are recorded in tiff_reads.
+    """
+
+    def __init__(self, n_pages=5):
+        self.n_pages = n_pages
+        self.reads = []
+        self.tiff_reads = []
+        self.destroyed = 0
+        self._lock = threading.Lock()
+
+    def fopenReadStream(self, filename):
+        return 1
+
+    def lept_fclose(self, stream):
+        return 0
+
+    def tiffGetCount(self, stream, n_pages):
+        n_pages._obj.value = self.n_pages
+        return 0
+
+    def pixReadTiff(self, filename, page_no):
+        with self._lock:
+            self.tiff_reads.append(page_no)
+            self.reads.append(page_no)
+            return 0x1000 + len(self.reads)
+
+    def pixReadFromMultipageTiff(self, filename, offset):
+        # directory of page n is at offset 100 * n
+        offset = offset._obj
+        page_no = offset.value // 100
+        with self._lock:
+            self.reads.append(page_no)
+            if page_no + 1 < self.n_pages:
+                offset.value = 100 * (page_no + 1)
+            else:
+                offset.value = 0
+            return 0x1000 + len(self.reads)
+
+    def pixDestroy(self, pointer):
+        self.destroyed += 1
+
+
+class PageSourceTest(unittest.TestCase):
+
+    def test_iteration_decodes_every_page_once(self):
+        leptonica = FakeLeptonica()
+        with PageSource(leptonica, 'pages.tif') as source:
+            pages = []
+            for pix_image in source:
+                with pix_image:
+                    pages.append(pix_image.pointer)
+        self.assertEqual(sorted(leptonica.reads), list(range(5)))
+        self.assertEqual(len(set(pages)), 5)
+        self.assertEqual(leptonica.destroyed, 5)
+        # pages are read in order from stored directory offsets
+        self.assertEqual(leptonica.tiff_reads, [])
+
+    def test_prefetched_page_is_reused(self):
+        leptonica = FakeLeptonica()
+        with PageSource(leptonica, 'pages.tif') as source:
+            source.prefetch(2)
+            with source[2]:
+                pass
+        self.assertEqual(leptonica.reads, [2])
+
+    def test_dropped_prefetch_is_released(self):
+        leptonica = FakeLeptonica()
+        with PageSource(leptonica, 'pages.tif') as source:
+            source.prefetch(1)
+            source.prefetch(3)
+            with source[3]:
+                pass
+        self.assertEqual(leptonica.destroyed, len(leptonica.reads))
+
+
+if __name__ == '__main__':
+    unittest.main()
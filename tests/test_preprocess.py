@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright © Zdenko Podobný 2014-2017
+# Licensed under the terms of the Apache License Version 2.0
+
+""" Tests of preprocessing chain description
+"""
+
+import unittest
+
+from libs import preprocess
+
+
+class ParseStepsTest(unittest.TestCase):
+
+    def test_parameters(self):
+        self.assertEqual(preprocess.parse_steps('gray, sauvola:window=31'),
+                         [('gray', {}), ('sauvola', {'window': 31.0})])
+
+    def test_unknown_parameter(self):
+        with self.assertRaisesRegex(ValueError, 'window, factor'):
+            preprocess.parse_steps('sauvola:windw=31')
+        with self.assertRaises(ValueError):
+            preprocess.parse_steps('gray:size=3')
+
+    def test_invalid_value(self):
+        with self.assertRaises(ValueError):
+            preprocess.parse_steps('scale:factor')
+
+
+if __name__ == '__main__':
+    unittest.main()
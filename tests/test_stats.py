@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright © Zdenko Podobný 2014-2017
+# Licensed under the terms of the Apache License Version 2.0
+
+""" Tests of statistics collection
+"""
+
+import unittest
+
+from libs import stats
+
+
+class StatsTest(unittest.TestCase):
+
+    def setUp(self):
+        stats.reset()
+
+    def tearDown(self):
+        stats.enable(False)
+        stats.reset()
+
+    def test_disabled(self):
+        stats.enable(False)
+        stats.add_time('startup/first_paint', 0.5)
+        stats.count('pages')
+        self.assertEqual(stats.snapshot(), {'timings': {}, 'counters': {}})
+
+    def test_enabled(self):
+        stats.enable()
+        stats.add_time('page/recognition', 0.5)
+        stats.add_time('page/recognition', 1.5)
+        stats.count('pages', 2)
+        self.assertEqual(stats.snapshot(), {
+            'timings': {'page/recognition': {'calls': 2, 'total': 2.0,
+                                             'max': 1.5}},
+            'counters': {'pages': 2}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright © Zdenko Podobný 2014-2017
+# Licensed under the terms of the Apache License Version 2.0
+
+""" Tests of selection of native renderers
+"""
+
+import unittest
+
+from libs import tesstool as tess
+from libs import writers
+
+
+class FakeTesseract(object):
+    """ Library exporting only text renderer
+    """
+
+    def TessTextRendererCreate(self, outputbase):
+        return None
+
+
+class HasRendererTest(unittest.TestCase):
+
+    def setUp(self):
+        self.version = tess.VERSION
+
+    def tearDown(self):
+        tess.VERSION = self.version
+
+    def test_version(self):
+        tess.VERSION = '3.03'
+        self.assertFalse(writers.has_renderer(FakeTesseract(), 'txt'))
+        tess.VERSION = '3.05.02'
+        self.assertTrue(writers.has_renderer(FakeTesseract(), 'txt'))
+
+    def test_missing_function(self):
+        tess.VERSION = '5.3.0'
+        self.assertFalse(writers.has_renderer(FakeTesseract(), 'pdf'))
+        self.assertFalse(writers.has_renderer(FakeTesseract(), 'jsonl'))
+
+
+if __name__ == '__main__':
+    unittest.main()